@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2020, 2021, 2022, Juan B Cabral
+# License: BSD-3-Clause
+#   Full Text: https://github.com/carpyncho/carpyncho-py/blob/master/LICENSE
+
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+"""Benchmark of the sequential and parallel bzip2 decompression.
+
+Usage::
+
+    $ python benchmarks/bench_bz2.py --size 200 --workers 1 2 4 8
+    $ python benchmarks/bench_bz2.py --catalogs _test:parquet_bz2_small \\
+        others:cpy_rr_v1
+
+The synthetic benchmark creates a light-curve like parquet file and
+compress it as a single bzip2 stream (like ``bzip2``) and as multiple
+streams (like ``pbzip2`` or ``lbzip2``). The catalog benchmark downloads
+real catalogs (network required).
+
+"""
+
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+import argparse
+import bz2
+import concurrent.futures
+import io
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import pandas as pd
+
+PATH = pathlib.Path(os.path.abspath(os.path.dirname(__file__)))
+
+sys.path.insert(0, str(PATH.parent))
+
+import carpyncho  # noqa
+
+# =============================================================================
+# SYNTHETIC
+# =============================================================================
+
+
+def make_parquet(size_mb):
+    random = np.random.default_rng(42)
+    rows = int(size_mb * 1024 * 1024 / 20)
+    df = pd.DataFrame(
+        {
+            "bm_src_id": np.repeat(
+                32140000000000 + np.arange(rows // 60 + 1), 60
+            )[:rows],
+            "pwp_id": random.integers(4600, 4700, rows),
+            "pwp_stack_src_id": 3 * 10**15 + np.arange(rows),
+            "pwp_stack_src_hjd": random.uniform(55000, 57000, rows),
+            "pwp_stack_src_mag3": random.normal(16, 1, rows).round(3),
+            "pwp_stack_src_mag_err3": random.uniform(0, 0.3, rows).round(3),
+        }
+    )
+    buff = io.BytesIO()
+    df.to_parquet(buff, compression=None)
+    return buff.getvalue()
+
+
+def compress_multistream(data, stream_size=900_000):
+    chunks = [
+        data[start : start + stream_size]  # noqa
+        for start in range(0, len(data), stream_size)
+    ]
+    with concurrent.futures.ThreadPoolExecutor() as pool:
+        return b"".join(pool.map(bz2.compress, chunks))
+
+
+def timeit(src, workers, repeat):
+    times = []
+    for _ in range(repeat):
+        with tempfile.TemporaryFile() as dst:
+            start = time.perf_counter()
+            carpyncho.bz2_decompress_file(src, dst, workers=workers)
+            times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def bench_synthetic(size_mb, workers_list, repeat, tmp_dir):
+    print(f"Creating synthetic parquet of ~{size_mb}MB...")
+    raw = make_parquet(size_mb)
+    print(f"  raw size: {len(raw) / 1024**2:.1f}MB")
+
+    files = {
+        "single-stream": tmp_dir / "single.bz2",
+        "multi-stream": tmp_dir / "multi.bz2",
+    }
+    files["single-stream"].write_bytes(bz2.compress(raw))
+    files["multi-stream"].write_bytes(compress_multistream(raw))
+
+    for name, path in files.items():
+        compressed = path.stat().st_size / 1024**2
+        print(f"{name} ({compressed:.1f}MB compressed)")
+        base = None
+        for workers in workers_list:
+            elapsed = timeit(path, workers, repeat)
+            base = base or elapsed
+            speed = len(raw) / 1024**2 / elapsed
+            print(
+                f"  workers={workers:<3} {elapsed:7.2f}s "
+                f"{speed:7.1f}MB/s  x{base / elapsed:.2f}"
+            )
+
+
+# =============================================================================
+# CATALOGS
+# =============================================================================
+
+
+def bench_catalogs(catalogs, workers_list, tmp_dir):
+    for tc in catalogs:
+        tile, catalog = tc.split(":", 1)
+        print(f"Catalog {tile}-{catalog}")
+        for workers in workers_list:
+            client = carpyncho.Carpyncho(
+                cache_path=tmp_dir / f"cache_{tile}_{catalog}_{workers}",
+                decompress_workers=workers,
+            )
+            start = time.perf_counter()
+            client.get_catalog(tile, catalog, force=True)
+            elapsed = time.perf_counter() - start
+            print(f"  workers={workers:<3} {elapsed:7.2f}s (with download)")
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=float, default=100, help="MB")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--catalogs", nargs="*", default=[])
+    args = parser.parse_args()
+
+    tmp_dir = pathlib.Path(tempfile.mkdtemp(suffix="_carpyncho_bench"))
+    try:
+        bench_synthetic(args.size, args.workers, args.repeat, tmp_dir)
+        bench_catalogs(args.catalogs, args.workers, tmp_dir)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
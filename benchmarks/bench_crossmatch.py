@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2020, 2021, 2022, Juan B Cabral
+# License: BSD-3-Clause
+#   Full Text: https://github.com/carpyncho/carpyncho-py/blob/master/LICENSE
+
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+"""Benchmark of the crossmatch against the features catalogs.
+
+Usage::
+
+    $ python benchmarks/bench_crossmatch.py --inputs 1000000 --tiles 4 \\
+        --sources 500000 --workers 1 4
+
+The benchmark creates synthetic features catalogs of contiguous tiles,
+serves them from a local HTTP server and crossmatch a list of random
+positions (half of them near a source) against all the tiles. The first
+crossmatch includes the download and the construction of the spatial
+indexes; the rest only the match.
+
+"""
+
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+import argparse
+import bz2
+import functools
+import hashlib
+import http.server
+import json
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+import pandas as pd
+
+PATH = pathlib.Path(os.path.abspath(os.path.dirname(__file__)))
+
+sys.path.insert(0, str(PATH.parent))
+
+import carpyncho  # noqa
+
+# =============================================================================
+# SYNTHETIC CATALOGS
+# =============================================================================
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args, **kwargs):
+        pass
+
+
+def make_features(tile_num, sources, random):
+    return pd.DataFrame(
+        {
+            "id": 32000000000000 + tile_num * 10**7 + np.arange(sources),
+            "ra_k": 265.0 + tile_num + random.uniform(0, 1, sources),
+            "dec_k": -30.0 + random.uniform(0, 1, sources),
+            "vs_type": np.full(sources, ""),
+        }
+    )
+
+
+def serve_catalogs(root, tiles, sources):
+    random = np.random.default_rng(42)
+    handler = functools.partial(QuietHandler, directory=str(root))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    index, catalogs = {}, []
+    for tile_num in range(tiles):
+        tile = f"b{201 + tile_num}"
+        features = make_features(tile_num, sources, random)
+        catalogs.append(features)
+
+        filename = f"features_{tile}.parquet.bz2"
+        data = bz2.compress(features.to_parquet(compression=None))
+        (root / filename).write_bytes(data)
+        index[tile] = {
+            "features": {
+                "md5sum": f"{hashlib.md5(data).hexdigest()}  {filename}",
+                "filename": filename,
+                "url": f"{base_url}/{filename}",
+                "size": len(data),
+                "records": sources,
+            }
+        }
+
+    index_path = root / "index.json"
+    index_path.write_text(json.dumps(index))
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, index_path, pd.concat(catalogs, ignore_index=True)
+
+
+def make_inputs(features, inputs, random):
+    # half of the positions are near (0.5 arcsec) of a source and the other
+    # half are random positions over all the tiles
+    near = features.sample(inputs // 2, random_state=42, replace=True)
+    offset = random.uniform(-0.5, 0.5, len(near)) / 3600.0
+    far = inputs - len(near)
+    ra_min, ra_max = features.ra_k.min(), features.ra_k.max()
+    return pd.DataFrame(
+        {
+            "ra": np.append(
+                near.ra_k + offset, random.uniform(ra_min, ra_max, far)
+            ),
+            "dec": np.append(near.dec_k, random.uniform(-30.0, -29.0, far)),
+        }
+    )
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--inputs", type=int, default=1_000_000)
+    parser.add_argument("--tiles", type=int, default=4)
+    parser.add_argument("--sources", type=int, default=500_000)
+    parser.add_argument("--radius", type=float, default=1.0, help="arcsec")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    tmp_dir = pathlib.Path(tempfile.mkdtemp(suffix="_carpyncho_bench"))
+    root = tmp_dir / "server"
+    root.mkdir()
+    try:
+        print(
+            f"Creating {args.tiles} tiles with {args.sources} sources "
+            f"and {args.inputs} positions..."
+        )
+        server, index_path, features = serve_catalogs(
+            root, args.tiles, args.sources
+        )
+        df = make_inputs(features, args.inputs, np.random.default_rng(42))
+
+        client = carpyncho.Carpyncho(
+            cache_path=tmp_dir / "cache", index_url=str(index_path)
+        )
+
+        start = time.perf_counter()
+        result = client.crossmatch(df, radius=args.radius)
+        elapsed = time.perf_counter() - start
+        print(
+            f"  first run {elapsed:7.2f}s "
+            f"(download and index, {result.id.notna().sum()} matches)"
+        )
+
+        for workers in args.workers:
+            times = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                client.crossmatch(df, radius=args.radius, max_workers=workers)
+                times.append(time.perf_counter() - start)
+            elapsed = min(times)
+            print(
+                f"  workers={workers:<3} {elapsed:7.2f}s "
+                f"{args.inputs / elapsed:12,.0f} positions/s"
+            )
+
+        server.shutdown()
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
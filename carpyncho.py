@@ -18,7 +18,12 @@ Carpyncho https://carpyncho.github.io/.
 """
 
 
-__all__ = ["Carpyncho", "CARPYNCHOPY_DATA_PATH"]
+__all__ = [
+    "Carpyncho",
+    "AsyncCarpyncho",
+    "LightCurveSet",
+    "CARPYNCHOPY_DATA_PATH",
+]
 
 
 __version__ = "0.3"
@@ -28,15 +33,27 @@ __version__ = "0.3"
 # IMPORTS
 # =============================================================================
 
+import asyncio
 import bz2
+import collections
+import concurrent.futures
+import contextlib
+import fnmatch
 import functools
 import hashlib
+import importlib
 import inspect
-import io
+import itertools
 import json
+import mmap
+import operator
 import os
 import pathlib
 import pickle
+import re
+import tempfile
+import threading
+import time
 import typing as t
 import urllib
 
@@ -46,14 +63,25 @@ import diskcache as dcache
 
 import humanize
 
+import numpy as np
+
 import pandas as pd
 
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
 import requests
+import requests.adapters
+
+from scipy import spatial
 
 import tqdm
 
 import typer
 
+import urllib3.util
+
 # =============================================================================
 # CONSTANTS
 # =============================================================================
@@ -70,24 +98,511 @@ CARPYNCHOPY_DATA_PATH = pathlib.Path(
 )
 
 
+#: Seconds before the index is revalidated against the server.
+INDEX_EXPIRE = 3600
+
 #: Chunk size when the library are download the big files of Carpyncho.
 CHUNK_SIZE = 32768
 
-#: Maximun cache size (10TB)
+#: Default number of rows of every chunk returned by Carpyncho.iter_catalog.
+DEFAULT_BATCH_SIZE = 1_000_000
+
+#: Maximum number of rows of an Excel sheet, without the header.
+EXCEL_MAX_ROWS = 1_048_575
+
+#: Compressions available for the catalogs exported by the CLI, and the
+#: extension of the compressed csv files.
+EXPORT_COMPRESSIONS = {"gzip": ".gz", "zstd": ".zst"}
+
+#: Number of rows of every row-group of the light-curves sorted by source.
+#: Small row-groups make the lookup of a single source faster.
+LIGHTCURVE_ROW_GROUP_SIZE = 50_000
+
+#: Columns of the light-curves catalogs with the source id, the time of the
+#: observation, the magnitude and their error.
+LC_ID, LC_TIME, LC_MAG, LC_MAG_ERR = (
+    "bm_src_id",
+    "pwp_stack_src_hjd",
+    "pwp_stack_src_mag3",
+    "pwp_stack_src_mag_err3",
+)
+
+#: Columns with the position (in degrees) of the sources in the features
+#: catalogs.
+RA_COLUMN, DEC_COLUMN = "ra_k", "dec_k"
+
+#: How many spatial indexes are kept in memory.
+SKY_INDEX_CACHE_SIZE = 32
+
+#: Types used to reduce the memory of the catalogs read with
+#: ``compact=True``. The numeric types are only used if the values of the
+#: stored catalog fits in the type.
+COMPACT_SCHEMAS = {
+    "lc": {
+        LC_ID: "int32",
+        "pwp_id": "int32",
+        "pwp_stack_src_id": "int32",
+        LC_MAG: "float32",
+        LC_MAG_ERR: "float32",
+    },
+    "features": {"vs_type": "category", "vs_catalog": "category"},
+}
+
+#: Libraries in which the catalogs can be returned.
+BACKENDS = ("pandas", "arrow", "polars")
+
+#: How many catalogs are downloaded at the same time by default.
+DEFAULT_MAX_WORKERS = 4
+
+#: How many threads are used to decompress a catalog by default. With only
+#: one thread the catalog is decompressed while is downloaded.
+DEFAULT_DECOMPRESS_WORKERS = 1
+
+#: Minimum size of compressed data that every decompression thread process
+#: at once.
+BZ2_SEGMENT_SIZE = 8 * 1024 * 1024
+
+#: In how many concurrent byte-range segments a big catalog is downloaded by
+#: default. One means a single stream.
+DEFAULT_DOWNLOAD_SEGMENTS = 1
+
+#: Minimum size (in bytes) of a catalog to be downloaded in segments.
+SEGMENTED_DOWNLOAD_THRESHOLD = 500 * 1024 * 1024
+
+#: Seconds to wait for the server to send data before giving up.
+DEFAULT_HTTP_TIMEOUT = 60.0
+
+#: How many times a failed HTTP request (connection errors or 5xx responses)
+#: is retried by default.
+DEFAULT_HTTP_RETRIES = 5
+
+#: Backoff factor between retries. The sleep before the n-th retry is
+#: ``HTTP_BACKOFF_FACTOR * 2 ** (n - 1)`` seconds.
+HTTP_BACKOFF_FACTOR = 0.5
+
+#: Maximum number of connections keep-alive by the HTTP session.
+HTTP_POOL_SIZE = 32
+
+#: Maximun cache size in bytes (10GB)
 DEFAULT_CACHE_SIZE_LIMIT = int(1e10)
 
+#: Policies to select which catalogs are removed when the cache is full:
+#: "lru" (least recently used), "lfu" (least frequently used) or "none"
+#: (never remove a catalog).
+EVICTION_POLICIES = ("lru", "lfu", "none")
+
+#: Default eviction policy of the cache.
+DEFAULT_EVICTION_POLICY = "lru"
+
+#: Expected ratio between the size of a catalog and their compressed file.
+#: Is used to estimate the space needed before a download.
+CATALOG_EXPANSION_RATIO = 2
+
 #: The location of the cache catabase and files.
 DEFAULT_CACHE_DIR = CARPYNCHOPY_DATA_PATH / "_cache_"
 
+#: Name of the directory, inside the cache directory, where the catalogs are
+#: stored as plain parquet files.
+CATALOGS_DIRNAME = "_catalogs_"
+
+#: Name of the files of the catalogs directory managed by the cache
+#: (``<catalog>-<md5sum>.<extension>``).
+CATALOG_FILE_PATTERN = re.compile(
+    r".+-[0-9a-f]{32}\.(parquet|sorted\.parquet|index\.npz|sky\.pkl)"
+)
+
+#: Minimum seconds between two expirations of the cache triggered by a write.
+CACHE_MAINTENANCE_INTERVAL = 3600
+
 #: The default carpyncho parquet default
 DEFAULT_PARQUET_ENGINE = "auto"
 
 
+# =============================================================================
+# PARQUET
+# =============================================================================
+
+
+def import_optional(name, feature):
+    """Import an optional dependency of carpyncho.
+
+    Parameters
+    ----------
+    name: str
+        The name of the module and of the carpyncho extra that install it.
+    feature: str
+        Description of the feature that requires the module, used in the
+        error message.
+
+    Returns
+    -------
+    module:
+        The imported module.
+
+    Raises
+    ------
+    ImportError:
+        If the module is not installed.
+
+    """
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        raise ImportError(
+            f"{feature} requires {name}. "
+            f"Install it with 'pip install carpyncho[{name}]'"
+        )
+
+
+def filters_to_polars(filters):
+    """Convert filters in DNF to a polars expression.
+
+    Parameters
+    ----------
+    filters: list of tuples or list of lists of tuples
+        The filters in pyarrow disjunctive normal form (DNF).
+
+    Returns
+    -------
+    polars.Expr
+
+    """
+    pl = import_optional("polars", "The 'polars' backend")
+    operators = {
+        "=": operator.eq,
+        "==": operator.eq,
+        "!=": operator.ne,
+        "<": operator.lt,
+        "<=": operator.le,
+        ">": operator.gt,
+        ">=": operator.ge,
+        "in": lambda column, value: column.is_in(list(value)),
+        "not in": lambda column, value: ~column.is_in(list(value)),
+    }
+
+    # a single list of tuples is a conjunction
+    if filters and isinstance(filters[0], tuple):
+        filters = [filters]
+
+    conjunctions = [
+        functools.reduce(
+            operator.and_,
+            [operators[op](pl.col(col), value) for col, op, value in conj],
+        )
+        for conj in filters
+    ]
+    return functools.reduce(operator.or_, conjunctions)
+
+
+def resolve_parquet_engine(engine):
+    """Resolve the name of the parquet library that pandas will use.
+
+    Parameters
+    ----------
+    engine: str
+        Any valid value of the ``engine`` parameter of ``pandas.read_parquet``.
+
+    Returns
+    -------
+    str:
+        ``"pyarrow"`` or ``"fastparquet"``. Because pyarrow is a hard
+        dependency of carpyncho, ``"auto"`` always resolve to ``"pyarrow"``
+        unless the ``io.parquet.engine`` option says otherwise.
+
+    """
+    if engine == "auto":
+        engine = pd.get_option("io.parquet.engine")
+    if engine == "auto":
+        engine = "pyarrow"
+    return engine
+
+
+# =============================================================================
+# BZIP2
+# =============================================================================
+
+#: Header of a bzip2 stream followed by the magic number of its first block.
+BZ2_STREAM_START = re.compile(rb"BZh[1-9]1AY&SY")
+
+
+class BZ2MultiStreamDecompressor:
+    """Incremental bzip2 decompressor that supports multi-stream data.
+
+    ``bz2.BZ2Decompressor`` stops at the end of the first stream; this
+    object starts a new one every time a stream ends, so it can decompress
+    the files created by parallel compressors like pbzip2 or lbzip2.
+
+    """
+
+    def __init__(self):
+        self._decompressor = bz2.BZ2Decompressor()
+
+    def decompress(self, data):
+        """Decompress data, returning the uncompressed bytes available."""
+        results = []
+        while data:
+            if self._decompressor.eof:
+                self._decompressor = bz2.BZ2Decompressor()
+            results.append(self._decompressor.decompress(data))
+            data = self._decompressor.unused_data
+        return b"".join(results)
+
+
+class MD5Writer:
+    """Binary file wrapper that calculates the md5 of the written data.
+
+    The data must be written sequentially. The file can only be rewound to
+    the start (to write it again), and then the checksum starts again.
+
+    """
+
+    def __init__(self, fp):
+        self._fp = fp
+        self._hash = hashlib.md5()
+
+    def write(self, data):
+        """Write the data and update the checksum."""
+        self._hash.update(data)
+        return self._fp.write(data)
+
+    def tell(self):
+        """Return the current position of the file."""
+        return self._fp.tell()
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        """Rewind the file to the start, or stay in the current position."""
+        position = self._fp.tell()
+        target = self._fp.seek(offset, whence)
+        if target == 0:
+            self._hash = hashlib.md5()
+        elif target != position:
+            self._fp.seek(position)
+            raise ValueError("MD5Writer can only be rewound to the start")
+        return target
+
+    def truncate(self):
+        """Truncate the file at the current position."""
+        return self._fp.truncate()
+
+    def hexdigest(self):
+        """Return the md5 of the data written since the start."""
+        return self._hash.hexdigest()
+
+
+def bz2_segments(data, segment_size=BZ2_SEGMENT_SIZE):
+    """Split multi-stream bzip2 data in groups of complete streams.
+
+    Parameters
+    ----------
+    data: bytes-like
+        The entire bzip2 data.
+    segment_size: int (default=8MiB)
+        Minimum size of every segment.
+
+    Returns
+    -------
+    list of tuples of two int:
+        The ``(start, end)`` of every segment. The list has a single
+        segment if the data has only one stream.
+
+    Notes
+    -----
+    The starts of the streams are found looking for a stream header followed
+    by a block magic number. This pattern can also appear by chance inside
+    the compressed data, so the segments must be validated when they are
+    decompressed.
+
+    """
+    starts = [m.start() for m in BZ2_STREAM_START.finditer(data)]
+    if not starts or starts[0] != 0:
+        return [(0, len(data))]
+
+    segments, seg_start = [], 0
+    for start in starts[1:]:
+        if start - seg_start >= segment_size:
+            segments.append((seg_start, start))
+            seg_start = start
+    segments.append((seg_start, len(data)))
+    return segments
+
+
+def bz2_decompress_file(src, dst, workers=1, segment_size=BZ2_SEGMENT_SIZE):
+    """Decompress a bzip2 file into a binary file-like object.
+
+    If the file has more than one stream (like the files created by pbzip2 or
+    lbzip2), groups of streams are decompressed in parallel. Otherwise, or if
+    the streams can't be decompressed independently, the file is
+    decompressed sequentially.
+
+    Parameters
+    ----------
+    src: str or path-like
+        Path of the bzip2 file.
+    dst: file-like
+        Where the decompressed data is written.
+    workers: int (default=1)
+        Number of threads used to decompress. bz2 releases the GIL so the
+        threads run in different cores.
+    segment_size: int (default=8MiB)
+        Minimum size of compressed data that every thread process at once.
+
+    Returns
+    -------
+    bool:
+        True if the data was decompressed in parallel.
+
+    """
+    with open(src, "rb") as fp:
+        if not os.fstat(fp.fileno()).st_size:
+            return False
+
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            segments = bz2_segments(data, segment_size=segment_size)
+
+            if workers > 1 and len(segments) > 1:
+                start = dst.tell()
+                try:
+                    _bz2_parallel_decompress(data, segments, dst, workers)
+                    return True
+                except (OSError, ValueError, EOFError):
+                    # some start of stream was a false positive
+                    dst.seek(start)
+                    dst.truncate()
+
+            decompressor = BZ2MultiStreamDecompressor()
+            for start in range(0, len(data), segment_size):
+                end = start + segment_size
+                dst.write(decompressor.decompress(data[start:end]))
+
+    return False
+
+
+def _bz2_parallel_decompress(data, segments, dst, workers):
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        # only a few segments are in memory at the same time
+        pending = collections.deque()
+        for start, end in segments:
+            pending.append(pool.submit(bz2.decompress, data[start:end]))
+            if len(pending) >= workers * 2:
+                dst.write(pending.popleft().result())
+        while pending:
+            dst.write(pending.popleft().result())
+
+
+# =============================================================================
+# SKY GEOMETRY
+# =============================================================================
+
+
+def radec_to_xyz(ra, dec):
+    """Convert equatorial coordinates into cartesian unit vectors.
+
+    Parameters
+    ----------
+    ra, dec: float or array-like
+        Right ascension and declination in degrees.
+
+    Returns
+    -------
+    numpy.ndarray:
+        Array of shape ``(N, 3)`` with the unit vectors.
+
+    """
+    ra = np.radians(np.asarray(ra, dtype=float))
+    dec = np.radians(np.asarray(dec, dtype=float))
+    cos_dec = np.cos(dec)
+    return np.column_stack(
+        [cos_dec * np.cos(ra), cos_dec * np.sin(ra), np.sin(dec)]
+    )
+
+
+def arcsec_to_chord(arcsec):
+    """Convert angular distances into distances between unit vectors.
+
+    Parameters
+    ----------
+    arcsec: float or array-like
+        Angular distances in arcseconds.
+
+    Returns
+    -------
+    float or numpy.ndarray:
+        The length of the chords.
+
+    """
+    return 2 * np.sin(np.radians(np.asarray(arcsec) / 3600.0) / 2)
+
+
+def chord_to_arcsec(chord):
+    """Convert distances between unit vectors into angular distances.
+
+    Parameters
+    ----------
+    chord: float or array-like
+        The length of the chords.
+
+    Returns
+    -------
+    float or numpy.ndarray:
+        The angular distances in arcseconds.
+
+    """
+    half = np.clip(np.asarray(chord) / 2, 0, 1)
+    return np.degrees(2 * np.arcsin(half)) * 3600.0
+
+
 # =============================================================================
 # CACHE ORCHESTRATION
 # =============================================================================
 
 
+def md5_file(path):
+    """Calculate the md5 checksum of a file.
+
+    Parameters
+    ----------
+    path: str or pathlib.Path
+        The file to check.
+
+    Returns
+    -------
+    str:
+        The hexadecimal md5 digest.
+
+    """
+    file_hash = hashlib.md5()
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(CHUNK_SIZE * 32), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def cache_key(tag, *args, **kwargs):
+    """Create the key used by ``from_cache`` to store a function call.
+
+    Parameters
+    ----------
+    tag: str
+        The same tag used in ``from_cache``.
+
+    args and kwargs:
+        The same parameters used in ``from_cache``.
+
+    Returns
+    -------
+    tuple:
+        The key of the call in the cache.
+
+    """
+    return dcache.core.args_to_key(
+        base=("carpyncho", tag),
+        args=args,
+        kwargs=kwargs,
+        typed=False,
+        ignore=[],
+    )
+
+
 def from_cache(
     cache, tag, function, cache_expire, force=False, *args, **kwargs
 ):
@@ -118,17 +633,9 @@ def from_cache(
 
     """
     # start the cache orchestration
-    key = dcache.core.args_to_key(
-        base=("carpyncho", tag),
-        args=args,
-        kwargs=kwargs,
-        typed=False,
-        ignore=[],
-    )
+    key = cache_key(tag, *args, **kwargs)
 
     with cache as c:
-        c.expire()
-
         value = (
             dcache.core.ENOVAL
             if force
@@ -144,113 +651,870 @@ def from_cache(
                 tag=f"carpyncho.{tag}",
                 retry=True,
             )
+            expire_cache(c, throttle=True)
 
     return value
 
 
-# =============================================================================
-# CLIENT
-# =============================================================================
-
-
-@attr.s(hash=False, frozen=True)
-class Carpyncho:
-    """Client to access the *Carpyncho VVV dataset collection*.
-
-    This code access as a Pandas Dataframe all the data of the web version of
-    Carpyncho. https://carpyncho.github.io/.
+def expire_cache(cache, throttle=False):
+    """Remove the expired items from the cache.
 
     Parameters
     ----------
-    cache : ``diskcache.Cache``, ``diskcache.Fanout``,
-        or ``None`` (default: ``None``)
-        Any instance of ``diskcache.Cache``, ``diskcache.Fanout`` or
-        ``None`` (Default). If it's ``None`` a ``diskcache.Cache``
-        istance is created with the parameter
-        ``directory = carpyncho.DEFAULT_CACHE_DIR``.
-        More information: http://www.grantjenks.com/docs/diskcache
-    cache_expire : ``float`` or None (default=``None``)
-        Seconds until item expires (default ``None``, no expiry)
-        More information: http://www.grantjenks.com/docs/diskcache
-    parquet_engine : ``str`` (default="auto")
-        Default Parquet library to use.
-        Remotely carpyncho stores all the data as compresses parquet files;
-        When the download happend a this must be parsed.
-        If ‘auto’, then the option io.parquet.engine is used.
-        The default io.parquet.engine behavior is to try ‘pyarrow’, falling
-        back to ‘fastparquet’ if ‘pyarrow’ is unavailable.
+    cache: diskcache.Cache
+        The cache to clean.
+    throttle: bool (default=False)
+        If its True, the cache is only expired if the last expiration was
+        more than ``CACHE_MAINTENANCE_INTERVAL`` seconds ago.
 
+    Returns
+    -------
+    int:
+        The number of expired items.
 
     """
+    key = cache_key("expire_cache")
+    now = time.time()
+    if throttle:
+        last = cache.get(key, default=0, retry=True)
+        if now - last < CACHE_MAINTENANCE_INTERVAL:
+            return 0
+    expired = cache.expire(now=now, retry=True)
+    cache.set(key, now, retry=True)
+    return expired
 
-    #: Location of the catalog cache
-    cache_path: str = attr.ib(default=DEFAULT_CACHE_DIR)
 
-    #: Default timeout of the catalog-cache.
-    #: Try to always set to None (default), the catalogs are big and mostly
-    #: never change.
-    cache_expire: float = attr.ib(default=None, repr=False)
+# =============================================================================
+# LIGHT CURVE SET
+# =============================================================================
 
-    #: Default Parquet library to use.
-    parquet_engine: str = attr.ib(DEFAULT_PARQUET_ENGINE)
 
-    #: Location of the carpyncho index (usefull for development)
-    index_url: str = attr.ib(default=CARPYNCHO_INDEX_URL)
+@attr.s(frozen=True, repr=False, eq=False)
+class LightCurveSet:
+    """Light curves of many sources stored as contiguous arrays.
 
-    # =========================================================================
-    # Cache properti
-    # =========================================================================
+    The observations are sorted by source and time, and the observations of
+    the source ``ids[i]`` are the rows ``offsets[i]:offsets[i + 1]`` of every
+    column (like a CSR sparse matrix). So retrieve a source only creates
+    views of the arrays, and the statistics of all the sources are computed
+    at once with numpy.
 
-    @property
-    @functools.lru_cache(maxsize=None)
-    def cache(self):
-        """Return the internal cache of the client the internal cache."""
-        return dcache.Cache(
-            directory=self.cache_path,
-            size_limit=DEFAULT_CACHE_SIZE_LIMIT,
-            default_pickle_protocol=pickle.DEFAULT_PROTOCOL,
-        )
+    Parameters
+    ----------
+    ids: numpy.ndarray
+        The sorted ids of the sources.
+    offsets: numpy.ndarray
+        Where the observations of every source starts (``len(ids) + 1``
+        elements).
+    data: dict
+        The arrays of every column.
 
-    # =========================================================================
-    # UTILITIES FOR CHECK THE REMOTE DATA
-    # =========================================================================
+    """
 
-    def retrieve_index(self, reset):
-        """Access the remote index of the Carpyncho-Dataset.
+    ids: np.ndarray = attr.ib()
+    offsets: np.ndarray = attr.ib()
+    data: dict = attr.ib()
+
+    @offsets.validator
+    def _check_offsets(self, attribute, value):
+        if len(value) != len(self.ids) + 1:
+            raise ValueError("offsets must have len(ids) + 1 elements")
 
-        The index is stored internally for 1 hr.
+    @classmethod
+    def from_frame(cls, df, columns=None):
+        """Create a new set from a DataFrame of light curves.
 
         Parameters
         ----------
-        reset: bool
-            If its True the entire cache is ignored and a new index is
-            donwloaded and cached.
+        df: pandas.DataFrame
+            The observations with the columns ``bm_src_id`` and
+            ``pwp_stack_src_hjd``.
+        columns: list of str or None (default=None)
+            The columns to store. By default ``pwp_stack_src_hjd``,
+            ``pwp_stack_src_mag3`` and ``pwp_stack_src_mag_err3``.
 
         Returns
         -------
-        dict with the index structure.
+        LightCurveSet
 
         """
+        columns = [LC_TIME, LC_MAG, LC_MAG_ERR] if columns is None else columns
+        order = np.lexsort((df[LC_TIME].to_numpy(), df[LC_ID].to_numpy()))
+        ids = df[LC_ID].to_numpy()[order]
+
+        is_start = np.ones(len(ids), dtype=bool)
+        is_start[1:] = ids[1:] != ids[:-1]
+        starts = np.flatnonzero(is_start)
+
+        return cls(
+            ids=ids[starts],
+            offsets=np.append(starts, len(ids)),
+            data={c: df[c].to_numpy()[order] for c in columns},
+        )
 
-        def get_json_data(url):
-            parsed = urllib.parse.urlparse(url)
-            if parsed.scheme in ("http", "https", "ftp"):
+    def __repr__(self):
+        """x.__repr__() <==> repr(x)."""
+        return (
+            f"<LightCurveSet sources={len(self.ids)} "
+            f"observations={self.offsets[-1]} columns={list(self.data)}>"
+        )
 
-                response = requests.get(
-                    url, headers={"Cache-Control": "no-cache"}
-                )
-                return response.json()
-            with open(url) as fp:
-                return json.load(fp)
+    def __eq__(self, other):
+        """x.__eq__(y) <==> x == y."""
+        if not isinstance(other, LightCurveSet):
+            return NotImplemented
+        if self.data.keys() != other.data.keys():
+            return False
+        arrays = [(self.ids, other.ids), (self.offsets, other.offsets)]
+        arrays.extend((v, other.data[k]) for k, v in self.data.items())
+        return all(np.array_equal(a, b) for a, b in arrays)
 
-        return from_cache(
-            cache=self.cache,
-            tag="get_index",
-            function=get_json_data,
-            cache_expire=3600,
-            force=reset,
-            url=self.index_url,
+    def __len__(self):
+        """x.__len__() <==> len(x)."""
+        return len(self.ids)
+
+    def __iter__(self):
+        """x.__iter__() <==> iter(x)."""
+        return iter(self.ids)
+
+    def __contains__(self, src_id):
+        """x.__contains__(y) <==> y in x."""
+        position = np.searchsorted(self.ids, src_id)
+        return position < len(self.ids) and self.ids[position] == src_id
+
+    def __getitem__(self, src_id):
+        """x.__getitem__(y) <==> x[y].
+
+        Return a dict with a view of every column for the given source.
+
+        """
+        if src_id not in self:
+            raise KeyError(src_id)
+        return self.source_at(np.searchsorted(self.ids, src_id))
+
+    def source_at(self, position):
+        """Return the light curve of the source in the given position.
+
+        Parameters
+        ----------
+        position: int
+            The position of the source in ``ids``.
+
+        Returns
+        -------
+        dict:
+            A view of every column (no data is copied).
+
+        """
+        start, end = self.offsets[position], self.offsets[position + 1]
+        return {c: values[start:end] for c, values in self.data.items()}
+
+    def counts(self):
+        """Return the number of observations of every source."""
+        return np.diff(self.offsets)
+
+    def mean(self, column=LC_MAG):
+        """Return the mean of a column for every source.
+
+        Parameters
+        ----------
+        column: str (default="pwp_stack_src_mag3")
+            The column to average.
+
+        Returns
+        -------
+        numpy.ndarray
+
+        """
+        values = self.data[column]
+        if not len(values):
+            return np.array([], dtype=float)
+        return np.add.reduceat(values, self.offsets[:-1]) / self.counts()
+
+    def time_span(self, column=LC_TIME):
+        """Return the time between the first and the last observation.
+
+        Parameters
+        ----------
+        column: str (default="pwp_stack_src_hjd")
+            The column with the time of the observations.
+
+        Returns
+        -------
+        numpy.ndarray
+
+        """
+        times = self.data[column]
+        return times[self.offsets[1:] - 1] - times[self.offsets[:-1]]
+
+    def summary(self):
+        """Return the number of observations, mean magnitude and time span.
+
+        Returns
+        -------
+        pandas.DataFrame:
+            With the columns ``count``, ``mean_mag`` and ``time_span`` and
+            the ids of the sources as index.
+
+        """
+        return pd.DataFrame(
+            {
+                "count": self.counts(),
+                "mean_mag": self.mean(),
+                "time_span": self.time_span(),
+            },
+            index=pd.Index(self.ids, name=LC_ID),
+        )
+
+    def to_frame(self):
+        """Return all the observations as a DataFrame."""
+        df = pd.DataFrame({LC_ID: np.repeat(self.ids, self.counts())})
+        for column, values in self.data.items():
+            df[column] = values
+        return df
+
+
+# =============================================================================
+# CLIENT
+# =============================================================================
+
+
+@attr.s(hash=False, frozen=True)
+class Carpyncho:
+    """Client to access the *Carpyncho VVV dataset collection*.
+
+    This code access as a Pandas Dataframe all the data of the web version of
+    Carpyncho. https://carpyncho.github.io/.
+
+    Parameters
+    ----------
+    cache : ``diskcache.Cache``, ``diskcache.Fanout``,
+        or ``None`` (default: ``None``)
+        Any instance of ``diskcache.Cache``, ``diskcache.Fanout`` or
+        ``None`` (Default). If it's ``None`` a ``diskcache.Cache``
+        istance is created with the parameter
+        ``directory = carpyncho.DEFAULT_CACHE_DIR``.
+        More information: http://www.grantjenks.com/docs/diskcache
+    cache_expire : ``float`` or None (default=``None``)
+        Seconds until item expires (default ``None``, no expiry)
+        More information: http://www.grantjenks.com/docs/diskcache
+    parquet_engine : ``str`` (default="auto")
+        Default Parquet library to use.
+        Remotely carpyncho stores all the data as compresses parquet files;
+        When the download happend a this must be parsed.
+        If ‘auto’, then the option io.parquet.engine is used.
+        The default io.parquet.engine behavior is to try ‘pyarrow’, falling
+        back to ‘fastparquet’ if ‘pyarrow’ is unavailable.
+    index_url : ``str``
+        Location of the carpyncho index (usefull for development).
+    decompress_workers : ``int`` (default=1)
+        Number of threads used to decompress the catalogs. With more than
+        one thread, if the compressed file has multiple bzip2 streams, it is
+        decompressed in parallel after the download.
+    download_segments : ``int`` (default=1)
+        Number of concurrent byte-range requests used to download the
+        catalogs bigger than ``carpyncho.SEGMENTED_DOWNLOAD_THRESHOLD``
+        (500MiB). If the server doesn't support range requests, a single
+        stream is used.
+    cache_size_limit : ``int`` (default=10GB)
+        Maximum size in bytes of the stored catalogs. Before a download the
+        catalogs are removed from the cache (following the
+        ``eviction_policy``) until the new one fits.
+    eviction_policy : ``str`` (default="lru")
+        Which catalogs are removed first when the cache is full: "lru"
+        (least recently used), "lfu" (least frequently used) or "none"
+        (never remove a catalog, and fail if a new one doesn't fit).
+    pinned_tiles : iterable of ``str`` (default=())
+        Tiles whose catalogs are never removed to free space.
+    http_timeout : ``float`` (default=60)
+        Seconds to wait for the server to connect or send data.
+    http_retries : ``int`` (default=5)
+        How many times a request is retried, with exponential backoff, after
+        a connection error or a 5xx response.
+
+    Notes
+    -----
+    The compressed bytes of every download are stored in a ``.part`` file
+    inside the cache directory until the catalog is decompressed. If a
+    download is interrupted, the next call resumes it with an HTTP ``Range``
+    request.
+
+
+    """
+
+    #: Location of the catalog cache
+    cache_path: str = attr.ib(default=DEFAULT_CACHE_DIR)
+
+    #: Default timeout of the catalog-cache.
+    #: Try to always set to None (default), the catalogs are big and mostly
+    #: never change.
+    cache_expire: float = attr.ib(default=None, repr=False)
+
+    #: Default Parquet library to use.
+    parquet_engine: str = attr.ib(DEFAULT_PARQUET_ENGINE)
+
+    #: Location of the carpyncho index (usefull for development)
+    index_url: str = attr.ib(default=CARPYNCHO_INDEX_URL)
+
+    #: Number of threads used to decompress the catalogs.
+    decompress_workers: int = attr.ib(
+        default=DEFAULT_DECOMPRESS_WORKERS, repr=False
+    )
+
+    #: Number of concurrent byte-range segments to download big catalogs.
+    download_segments: int = attr.ib(
+        default=DEFAULT_DOWNLOAD_SEGMENTS, repr=False
+    )
+
+    #: Seconds to wait for the server to connect or send data.
+    http_timeout: float = attr.ib(default=DEFAULT_HTTP_TIMEOUT, repr=False)
+
+    #: How many times a failed HTTP request is retried.
+    http_retries: int = attr.ib(default=DEFAULT_HTTP_RETRIES, repr=False)
+
+    #: Maximum size in bytes of the stored catalogs.
+    cache_size_limit: int = attr.ib(
+        default=DEFAULT_CACHE_SIZE_LIMIT, repr=False
+    )
+
+    #: Which catalogs are removed first when the cache is full.
+    eviction_policy: str = attr.ib(
+        default=DEFAULT_EVICTION_POLICY,
+        validator=attr.validators.in_(EVICTION_POLICIES),
+        repr=False,
+    )
+
+    #: Tiles whose catalogs are never removed to free space.
+    pinned_tiles: tuple = attr.ib(default=(), converter=tuple, repr=False)
+
+    # in-memory copy of the last index retrieved
+    _index_memo: dict = attr.ib(factory=dict, init=False, repr=False, eq=False)
+
+    # the cache space reserved by the downloads in progress, and the
+    # condition that makes the check of the budget atomic between threads
+    _reservations: dict = attr.ib(
+        factory=dict, init=False, repr=False, eq=False
+    )
+    _budget: threading.Condition = attr.ib(
+        factory=threading.Condition, init=False, repr=False, eq=False
+    )
+
+    # a lock for every catalog, so the same catalog is never downloaded by
+    # two threads at the same time
+    _download_locks: dict = attr.ib(
+        factory=dict, init=False, repr=False, eq=False
+    )
+
+    # =========================================================================
+    # Cache properti
+    # =========================================================================
+
+    @property
+    @functools.lru_cache(maxsize=None)
+    def cache(self):
+        """Return the internal cache of the client the internal cache."""
+        return dcache.Cache(
+            directory=self.cache_path,
+            size_limit=self.cache_size_limit,
+            default_pickle_protocol=pickle.DEFAULT_PROTOCOL,
+        )
+
+    @property
+    @functools.lru_cache(maxsize=None)
+    def session(self):
+        """HTTP session shared by all the requests of the client.
+
+        The session keeps the connections alive between requests, and
+        retries with exponential backoff the connection errors and the
+        5xx responses.
+
+        """
+        retry = urllib3.util.Retry(
+            total=self.http_retries,
+            backoff_factor=HTTP_BACKOFF_FACTOR,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=("GET", "HEAD"),
+            raise_on_status=False,
+        )
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=HTTP_POOL_SIZE,
+            pool_maxsize=HTTP_POOL_SIZE,
+            max_retries=retry,
+        )
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    @property
+    def catalogs_path(self):
+        """Directory where the downloaded catalogs are stored as parquet."""
+        return pathlib.Path(self.cache_path) / CATALOGS_DIRNAME
+
+    def cache_maintenance(self):
+        """Remove the expired items of the cache and their catalog files.
+
+        The reads of the cache never check the expiration of the other
+        items, so this method (also called periodically when a new catalog
+        is stored) removes all the expired items. The catalog files not
+        referenced by any item of the cache are removed too.
+
+        Returns
+        -------
+        dict:
+            ``expired`` is the number of removed cache items and
+            ``orphans`` the number of removed catalog files.
+
+        """
+        expired = expire_cache(self.cache)
+
+        referenced = set()
+        for key in self.cache.iterkeys():
+            if key[:2] not in (
+                ("carpyncho", "get_catalog"),
+                ("carpyncho", "get_lightcurve_index"),
+                ("carpyncho", "get_sky_index"),
+            ):
+                continue
+            meta = self.cache.get(key, retry=True)
+            if isinstance(meta, dict):
+                referenced.update(
+                    meta[k]
+                    for k in ("filename", "index_filename")
+                    if k in meta
+                )
+
+        # the access statistics of the removed catalogs
+        stale = [
+            key
+            for key in self.cache.iterkeys()
+            if key[:2] == ("carpyncho", "catalog_access")
+            if key[-1] not in referenced
+        ]
+        for key in stale:
+            self.cache.delete(key, retry=True)
+
+        orphans = 0
+        for path in self.catalogs_path.glob("*/*"):
+            filename = str(path.relative_to(self.catalogs_path))
+            managed = CATALOG_FILE_PATTERN.fullmatch(path.name)
+            if managed and filename not in referenced:
+                path.unlink()
+                orphans += 1
+
+        return {"expired": expired, "orphans": orphans}
+
+    # =========================================================================
+    # CACHE BUDGET
+    # =========================================================================
+
+    def _is_stored(self, meta):
+        # older versions of carpyncho store the entire dataframe in the
+        # cache, and the parquet file may be removed by hand.
+        if not isinstance(meta, dict):
+            return False
+        return (self.catalogs_path / meta["filename"]).exists()
+
+    def _iter_stored_catalogs(self):
+        for key in self.cache.iterkeys():
+            if key[:2] != ("carpyncho", "get_catalog"):
+                continue
+            meta = self.cache.get(key, retry=True)
+            if self._is_stored(meta):
+                yield key, meta
+
+    def _catalog_files(self, meta):
+        # all the files derived from a catalog share the same prefix
+        tile_path = self.catalogs_path / meta["tile"]
+        return list(tile_path.glob(f"{meta['catalog']}-{meta['md5sum']}.*"))
+
+    def _catalog_size(self, meta):
+        size = 0
+        for path in self._catalog_files(meta):
+            try:
+                size += path.stat().st_size
+            except FileNotFoundError:
+                pass
+        return size
+
+    def _catalog_access(self, meta):
+        key = cache_key("catalog_access", filename=meta["filename"])
+        default = {"hits": 0, "last_access": 0.0}
+        return self.cache.get(key, default=default, retry=True)
+
+    def _touch_catalog(self, meta):
+        key = cache_key("catalog_access", filename=meta["filename"])
+        access = self._catalog_access(meta)
+        access = {"hits": access["hits"] + 1, "last_access": time.time()}
+        self.cache.set(key, access, tag="carpyncho.catalog_access", retry=True)
+
+    def _remove_catalog(self, key, meta):
+        for path in self._catalog_files(meta):
+            path.unlink(missing_ok=True)
+
+        # the derived files are indexed with the same parameters
+        params = {
+            k: meta[k] for k in ("tile", "catalog", "md5sum", "filename")
+        }
+        keys = [
+            key,
+            cache_key("get_lightcurve_index", **params),
+            cache_key("get_sky_index", **params),
+            cache_key("catalog_access", filename=meta["filename"]),
+        ]
+        for k in keys:
+            self.cache.delete(k, retry=True)
+
+    def _eviction_order(self, stored):
+        # the catalogs that can be removed, the first one must be removed
+        # first. Without policy the catalogs are sorted as lru.
+        def priority(item):
+            access = self._catalog_access(item[1])
+            if self.eviction_policy == "lfu":
+                return access["hits"], access["last_access"]
+            return access["last_access"]
+
+        removables = [
+            item for item in stored if item[1]["tile"] not in self.pinned_tiles
+        ]
+        return sorted(removables, key=priority)
+
+    @contextlib.contextmanager
+    def _reserve_cache_space(
+        self, required, tile, catalog, md5sum, replace=False, keep=False
+    ):
+        """Reserve ``required`` bytes of the cache while the context runs.
+
+        Catalogs are removed until ``required`` bytes, plus the space
+        reserved by the other downloads in progress, fit in the cache; if
+        the catalog only fits when those downloads end, this waits for
+        them. The catalogs of the ``pinned_tiles``, the catalogs being
+        downloaded and the files of the catalog identified by ``tile``,
+        ``catalog`` and ``md5sum`` are never removed.
+
+        If ``replace`` is True the files of that catalog are going to be
+        overwritten, so they are not counted as used. If ``keep`` is True a
+        successful reservation is kept until ``_release_cache_space`` is
+        called, so the new files are counted until their metadata is
+        stored.
+
+        Raises
+        ------
+        IOError:
+            If the catalog doesn't fit in the cache even removing all the
+            removable catalogs.
+
+        """
+        current = (tile, catalog, md5sum)
+        token = object()
+        with self._budget:
+            while True:
+                try:
+                    self._free_cache_space(required, current, replace)
+                    break
+                except IOError:
+                    # the other downloads may release their space
+                    if not self._reservations:
+                        raise
+                    self._budget.wait()
+            self._reservations[token] = (current, required, False)
+        try:
+            yield
+        except BaseException:
+            with self._budget:
+                del self._reservations[token]
+                self._budget.notify_all()
+            raise
+        with self._budget:
+            if keep:
+                self._reservations[token] = (current, required, True)
+            else:
+                del self._reservations[token]
+            self._budget.notify_all()
+
+    def _release_cache_space(self, tile, catalog, md5sum):
+        # the catalog metadata is stored (or the download failed), so the
+        # kept reservations are no longer needed
+        current = (tile, catalog, md5sum)
+        with self._budget:
+            for token, (identity, _, done) in list(self._reservations.items()):
+                if done and identity == current:
+                    del self._reservations[token]
+            self._budget.notify_all()
+
+    def _free_cache_space(self, required, current, replace):
+        # must be called with the _budget condition acquired
+        stored = []
+        for key, meta in self._iter_stored_catalogs():
+            identity = (meta["tile"], meta["catalog"], meta["md5sum"])
+            if not (replace and identity == current):
+                stored.append((key, meta, self._catalog_size(meta)))
+
+        reserved = self._reservations.values()
+        busy = {identity for identity, _, _ in reserved}
+        busy.add(current)
+
+        used = sum(size for _, _, size in stored)
+        used += sum(size for _, size, _ in reserved)
+        if used + required <= self.cache_size_limit:
+            return
+
+        candidates = [
+            (key, meta, size)
+            for key, meta, size in self._eviction_order(stored)
+            if (meta["tile"], meta["catalog"], meta["md5sum"]) not in busy
+        ]
+        if self.eviction_policy == "none":
+            candidates = []
+
+        freeable = sum(size for _, _, size in candidates)
+        if used - freeable + required > self.cache_size_limit:
+            naturalsize = functools.partial(humanize.naturalsize, binary=True)
+            tile, catalog, _ = current
+            raise IOError(
+                f"Catalog {tile}-{catalog} needs {naturalsize(required)} but "
+                f"only {naturalsize(self.cache_size_limit - used + freeable)} "
+                f"of the cache can be used "
+                f"(limit={naturalsize(self.cache_size_limit)}, "
+                f"eviction_policy={self.eviction_policy!r}, "
+                f"pinned_tiles={self.pinned_tiles})"
+            )
+
+        for key, meta, size in candidates:
+            if used + required <= self.cache_size_limit:
+                break
+            self._remove_catalog(key, meta)
+            used -= size
+
+    # =========================================================================
+    # CACHE MANAGEMENT
+    # =========================================================================
+
+    def cache_list(self):
+        """Describe the catalogs stored in the cache.
+
+        Returns
+        -------
+        list of dict:
+            One dict for every stored catalog with the keys ``tile``,
+            ``catalog``, ``md5sum``, ``size`` (bytes on disk, including the
+            light-curves index), ``last_access`` (timestamp or None if the
+            catalog was never accessed) and ``hits``.
+
+        """
+        stored = []
+        for _, meta in self._iter_stored_catalogs():
+            access = self._catalog_access(meta)
+            stored.append(
+                {
+                    "tile": meta["tile"],
+                    "catalog": meta["catalog"],
+                    "md5sum": meta["md5sum"],
+                    "size": self._catalog_size(meta),
+                    "last_access": access["last_access"] or None,
+                    "hits": access["hits"],
+                }
+            )
+        return sorted(stored, key=lambda row: (row["tile"], row["catalog"]))
+
+    def cache_remove(self, tile, catalog=None):
+        """Remove catalogs from the cache.
+
+        Parameters
+        ----------
+        tile: str
+            The name of the tile.
+        catalog: str or None (default=None)
+            The name of the catalog. If its None all the catalogs of the tile
+            are removed.
+
+        Returns
+        -------
+        list of tuples:
+            The ``(tile, catalog)`` removed.
+
+        """
+        removed = []
+        for key, meta in list(self._iter_stored_catalogs()):
+            if meta["tile"] == tile and catalog in (None, meta["catalog"]):
+                self._remove_catalog(key, meta)
+                removed.append((meta["tile"], meta["catalog"]))
+        return removed
+
+    def cache_prune(self, older_than=None, max_size=None):
+        """Remove the old or less used catalogs from the cache.
+
+        The catalogs of the ``pinned_tiles`` are never removed.
+
+        Parameters
+        ----------
+        older_than: float or None (default=None)
+            Remove the catalogs not accessed in the last ``older_than``
+            seconds.
+        max_size: int or None (default=None)
+            Remove catalogs, following the ``eviction_policy`` (or "lru" if
+            the policy is "none"), until the cache uses at most ``max_size``
+            bytes.
+
+        Returns
+        -------
+        list of tuples:
+            The ``(tile, catalog)`` removed.
+
+        """
+        stored = [
+            (key, meta, self._catalog_size(meta))
+            for key, meta in self._iter_stored_catalogs()
+        ]
+
+        removed = []
+        if older_than is not None:
+            limit = time.time() - older_than
+            for item in self._eviction_order(stored):
+                key, meta, _ = item
+                if self._catalog_access(meta)["last_access"] < limit:
+                    self._remove_catalog(key, meta)
+                    removed.append((meta["tile"], meta["catalog"]))
+                    stored.remove(item)
+
+        if max_size is not None:
+            used = sum(size for _, _, size in stored)
+            for key, meta, size in self._eviction_order(stored):
+                if used <= max_size:
+                    break
+                self._remove_catalog(key, meta)
+                removed.append((meta["tile"], meta["catalog"]))
+                used -= size
+
+        return removed
+
+    def cache_verify(self, remove=False):
+        """Check the integrity of the catalogs stored in the cache.
+
+        Parameters
+        ----------
+        remove: bool (default=False)
+            If its True the "missing" and "corrupted" catalogs are removed
+            from the cache, so the next access download them again.
+
+        Returns
+        -------
+        list of dict:
+            One dict for every catalog with the keys ``tile``, ``catalog``,
+            ``md5sum`` and ``status``. The status can be "ok", "missing"
+            (the file was removed), "corrupted" (the md5 checksum of the
+            file changed) or "unchecked" (the catalog was stored by an older
+            version of carpyncho without checksum).
+
+        """
+        keys = [
+            key
+            for key in self.cache.iterkeys()
+            if key[:2] == ("carpyncho", "get_catalog")
+        ]
+
+        results = []
+        for key in keys:
+            meta = self.cache.get(key, retry=True)
+            if not isinstance(meta, dict):
+                continue
+
+            path = self.catalogs_path / meta["filename"]
+            if not path.exists():
+                status = "missing"
+            elif "parquet_md5sum" not in meta:
+                status = "unchecked"
+            elif md5_file(path) != meta["parquet_md5sum"]:
+                status = "corrupted"
+            else:
+                status = "ok"
+
+            if remove and status in ("missing", "corrupted"):
+                self._remove_catalog(key, meta)
+
+            results.append(
+                {
+                    "tile": meta["tile"],
+                    "catalog": meta["catalog"],
+                    "md5sum": meta["md5sum"],
+                    "status": status,
+                }
+            )
+        return sorted(results, key=lambda row: (row["tile"], row["catalog"]))
+
+    # =========================================================================
+    # UTILITIES FOR CHECK THE REMOTE DATA
+    # =========================================================================
+
+    def _fetch_index(self, previous):
+        url = self.index_url
+        parsed = urllib.parse.urlparse(url)
+        if parsed.scheme not in ("http", "https", "ftp"):
+            with open(url) as fp:
+                return {"index": json.load(fp), "checked": time.time()}
+
+        # if we have a previous version we ask only for changes
+        headers = {"Cache-Control": "no-cache"}
+        if previous and previous.get("etag"):
+            headers["If-None-Match"] = previous["etag"]
+        if previous and previous.get("last_modified"):
+            headers["If-Modified-Since"] = previous["last_modified"]
+
+        response = self.session.get(
+            url, headers=headers, timeout=self.http_timeout
+        )
+        if previous and response.status_code == 304:
+            return dict(previous, checked=time.time())
+
+        response.raise_for_status()
+        return {
+            "index": response.json(),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "checked": time.time(),
+        }
+
+    def retrieve_index(self, reset):
+        """Access the remote index of the Carpyncho-Dataset.
+
+        The index is stored in memory and in the cache. After 1 hr
+        (``carpyncho.INDEX_EXPIRE``) the index is revalidated with the
+        server using the ``ETag``/``Last-Modified`` headers, so it is only
+        downloaded again if it changes.
+
+        Parameters
+        ----------
+        reset: bool
+            If its True the entire cache is ignored and a new index is
+            donwloaded and cached.
+
+        Returns
+        -------
+        dict with the index structure.
+
+        """
+        # the memo is replaced as a whole, so other threads never see it
+        # half updated
+        url, entry = self._index_memo.get("entry", (None, None))
+        memo_valid = url == self.index_url and (
+            time.time() - entry["checked"] < INDEX_EXPIRE
         )
+        if memo_valid and not reset:
+            return entry["index"]
+
+        key = cache_key("get_index", url=self.index_url)
+        entry = None if reset else self.cache.get(key, retry=True)
+
+        # older versions of carpyncho store only the index in the cache
+        if not (isinstance(entry, dict) and "checked" in entry):
+            entry = None
+
+        if entry is None or time.time() - entry["checked"] >= INDEX_EXPIRE:
+            entry = self._fetch_index(entry)
+            self.cache.set(key, entry, tag="carpyncho.get_index", retry=True)
+
+        self._index_memo["entry"] = (self.index_url, entry)
+        return entry["index"]
 
     @property
     def index_(self):
@@ -305,145 +1569,1727 @@ class Carpyncho:
         cat = self.index_.get(tile, {}).get(catalog)
         return bool(cat)
 
-    def catalog_info(self, tile, catalog):
-        """Retrieve the information about a given catalog.
+    def catalog_info(self, tile, catalog):
+        """Retrieve the information about a given catalog.
+
+        Parameters
+        ----------
+        tile: str
+            The name of the tile.
+        catalog:
+            The name of the catalog.
+
+        Returns
+        -------
+        dict:
+            The entire information of the given catalog file. This include
+            url, md5 checksum, size in bytes, number of total records,
+            etc.
+
+        Raises
+        ------
+        ValueError:
+            If the tile or the catalog is not found.
+
+        """
+        index = self.index_
+
+        if tile not in index:
+            raise ValueError(f"Tile {tile} not found")
+
+        tile = index[tile]
+        if catalog not in tile:
+            raise ValueError(f"Catalog {catalog} for tile {tile} not found")
+
+        return tile[catalog]
+
+    # =========================================================================
+    # THE DOWNLOAD PART
+    # =========================================================================
+
+    def _read_parquet(self, path, **kwargs):
+        engine = resolve_parquet_engine(self.parquet_engine)
+        if engine == "pyarrow":
+            # the file is on disk, so pyarrow can map it instead of copy it
+            kwargs.setdefault("memory_map", True)
+        elif engine == "fastparquet" and kwargs.get("filters"):
+            # fastparquet only filter row-groups unless we ask for more
+            kwargs.setdefault("row_filter", True)
+        return pd.read_parquet(path, engine=engine, **kwargs)
+
+    def _compact_schema(self, catalog, path, columns):
+        compact = COMPACT_SCHEMAS.get(catalog, {})
+        pfile = pq.ParquetFile(path, memory_map=True)
+        metadata = pfile.metadata
+
+        # the min and max of every column from the row-group statistics
+        def value_range(name):
+            values = []
+            for rg in range(metadata.num_row_groups):
+                row_group = metadata.row_group(rg)
+                for col in range(row_group.num_columns):
+                    chunk = row_group.column(col)
+                    if chunk.path_in_schema != name:
+                        continue
+                    stats = chunk.statistics
+                    if stats is None or not stats.has_min_max:
+                        return None
+                    values.extend([stats.min, stats.max])
+            return (min(values), max(values)) if values else None
+
+        fields = []
+        for field in pfile.schema_arrow:
+            if columns is not None and field.name not in columns:
+                continue
+
+            target, vtype = compact.get(field.name), field.type
+            if target == "category":
+                vtype = pa.dictionary(pa.int32(), field.type)
+            elif target is not None:
+                dtype = np.dtype(target)
+                info = (np.iinfo if dtype.kind in "iu" else np.finfo)(dtype)
+                vrange = value_range(field.name)
+                if vrange and info.min <= vrange[0] and vrange[1] <= info.max:
+                    vtype = pa.from_numpy_dtype(dtype)
+            fields.append(pa.field(field.name, vtype))
+
+        return pa.schema(fields)
+
+    def _read_compact(self, catalog, path, columns, filters):
+        schema = self._compact_schema(catalog, path, columns)
+        categories = [
+            field.name
+            for field in schema
+            if pa.types.is_dictionary(field.type)
+        ]
+
+        # the categories are decoded directly as dictionaries, and every
+        # batch is downcasted before read the next one.
+        file_format = ds.ParquetFileFormat(
+            read_options=ds.ParquetReadOptions(dictionary_columns=categories)
+        )
+        dataset = ds.dataset(str(path), format=file_format)
+        if filters is not None:
+            filters = pq.filters_to_expression(filters)
+
+        tables = [
+            pa.Table.from_batches([batch]).cast(schema)
+            for batch in dataset.to_batches(
+                columns=schema.names, filter=filters
+            )
+        ]
+        table = pa.concat_tables(tables) if tables else schema.empty_table()
+        if columns is not None:
+            table = table.select(columns)
+        return table
+
+    def _scan_polars(self, catalog, path, columns, filters, compact):
+        pl = import_optional("polars", "The 'polars' backend")
+        frame = pl.scan_parquet(path)
+        if filters is not None:
+            frame = frame.filter(filters_to_polars(filters))
+        if columns is not None:
+            frame = frame.select(columns)
+        if compact:
+            targets = {
+                "int32": pl.Int32,
+                "float32": pl.Float32,
+                "category": pl.Categorical,
+            }
+            schema = self._compact_schema(catalog, path, columns)
+            original = pq.read_schema(path)
+            frame = frame.cast(
+                {
+                    field.name: targets[COMPACT_SCHEMAS[catalog][field.name]]
+                    for field in schema
+                    if field.type != original.field(field.name).type
+                }
+            )
+        return frame
+
+    def _stream_download(self, url, size, part_path, parquet_stream, pbar):
+        # the compressed bytes are stored in a ".part" file, so if the
+        # download is interrupted the next call continue from there
+        resume_from = part_path.stat().st_size if part_path.exists() else 0
+
+        # make the real deal request
+        response = None
+        if resume_from < size:
+            headers = {"Range": f"bytes={resume_from}-"} if resume_from else {}
+            response = self.session.get(
+                url, stream=True, headers=headers, timeout=self.http_timeout
+            )
+            response.raise_for_status()
+
+            # the server ignores the range, so we start from zero
+            if response.status_code != 206:
+                resume_from = 0
+
+        # the file is a bz2 file, we are going to decompress and store
+        # the raw parquet data into a temporary file inside the catalog
+        # store, so the decompressed bytes never live in memory
+        decompressor = BZ2MultiStreamDecompressor()
+
+        # to decompress in parallel we need the entire compressed file, so
+        # we don't decompress every chunk
+        inline = self.decompress_workers <= 1
+
+        # ademas necesitamos fijarnos que el md5 este ok
+        file_hash = hashlib.md5()
+
+        def consume(chunk):
+            nonlocal inline
+            file_hash.update(chunk)
+            if inline:
+                try:
+                    decompressed = decompressor.decompress(chunk)
+                    parquet_stream.write(decompressed)
+                except (OSError, EOFError):
+                    # corrupted data, the checksum will tell us where
+                    inline = False
+            pbar.update(len(chunk))
+
+        # first the data of the previous downloads
+        if resume_from:
+            with open(part_path, "rb") as part:
+                for chunk in iter(lambda: part.read(CHUNK_SIZE), b""):
+                    consume(chunk)
+
+        # retrive all the data one chunk at the time
+        mode = "ab" if resume_from else "wb"
+        with open(part_path, mode) as part:
+            chunks = (
+                [] if response is None else response.iter_content(CHUNK_SIZE)
+            )
+            for chunk in chunks:
+
+                if not chunk:
+                    break
+
+                part.write(chunk)
+                consume(chunk)
+
+        return file_hash.hexdigest(), inline
+
+    def _load_segments(self, size, segments_path, progress_path):
+        # the progress of a previous segmented download, if any
+        try:
+            progress = json.loads(progress_path.read_text())
+            complete = segments_path.stat().st_size == size
+        except (OSError, ValueError):
+            return None
+        if not complete or progress.get("size") != size:
+            return None
+        return [list(segment) for segment in progress["segments"]]
+
+    def _segmented_download(self, url, size, segments_path, pbar):
+        # the next byte of every segment is stored in a progress file, so
+        # if the download fails the next call only fetch the missing bytes
+        progress_path = segments_path.with_name(segments_path.name + ".json")
+        segments = self._load_segments(size, segments_path, progress_path)
+        resumed = segments is not None
+        if not resumed:
+            step = -(-size // self.download_segments)
+            segments = [
+                [start, min(start + step, size) - 1, start]
+                for start in range(0, size, step)
+            ]
+
+        def save_progress():
+            progress = {"size": size, "segments": segments}
+            progress_path.write_text(json.dumps(progress))
+
+        def request(start, end):
+            response = self.session.get(
+                url,
+                stream=True,
+                headers={"Range": f"bytes={start}-{end}"},
+                timeout=self.http_timeout,
+            )
+            response.raise_for_status()
+            return response
+
+        def fetch(segment, response=None):
+            _, end, start = segment
+            if response is None:
+                response = request(start, end)
+            with open(segments_path, "r+b") as fp:
+                fp.seek(start)
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    fp.write(chunk)
+                    segment[2] += len(chunk)
+                    pbar.update(len(chunk))
+            if segment[2] != end + 1:
+                raise IOError(f"Incomplete segment {start}-{end} of {url}")
+
+        pending = [segment for segment in segments if segment[2] <= segment[1]]
+        pbar.update(size - sum(end + 1 - nxt for _, end, nxt in pending))
+
+        first = None
+        if pending:
+            # the first request tell us if the server supports ranges
+            _, end, start = pending[0]
+            first = request(start, end)
+            if first.status_code != 206:
+                first.close()
+                progress_path.unlink(missing_ok=True)
+                segments_path.unlink(missing_ok=True)
+                return None
+
+        if not resumed:
+            # preallocate the entire file
+            with open(segments_path, "wb") as fp:
+                fp.truncate(size)
+
+        try:
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=max(len(pending), 1)
+            ) as executor:
+                futures = [executor.submit(fetch, s) for s in pending[1:]]
+                if pending:
+                    futures.append(executor.submit(fetch, pending[0], first))
+                for future in concurrent.futures.as_completed(futures):
+                    future.result()
+                    save_progress()
+
+        except BaseException:
+            # keep the downloaded segments for the next call
+            save_progress()
+            raise
+
+        progress_path.unlink(missing_ok=True)
+
+        file_hash = hashlib.md5()
+        with open(segments_path, "rb") as fp:
+            for chunk in iter(lambda: fp.read(BZ2_SEGMENT_SIZE), b""):
+                file_hash.update(chunk)
+        return file_hash.hexdigest()
+
+    def _http_download(self, tile, catalog, url, size, md5sum, pbar=None):
+        # the space is reserved until the catalog is stored, so parallel
+        # downloads can't exceed the cache budget together
+        required = size * CATALOG_EXPANSION_RATIO
+        with self._reserve_cache_space(
+            required, tile, catalog, md5sum, replace=True, keep=True
+        ):
+            return self._store_catalog(tile, catalog, url, size, md5sum, pbar)
+
+    def _store_catalog(self, tile, catalog, url, size, md5sum, pbar):
+        tile_path = self.catalogs_path / tile
+        tile_path.mkdir(parents=True, exist_ok=True)
+
+        # progress bar, if no one is provided we create our own
+        own_pbar = pbar is None
+        if own_pbar:
+            pbar = tqdm.tqdm(
+                total=size,
+                initial=0,
+                unit="B",
+                unit_scale=True,
+                desc=f"{tile}-{catalog}",
+            )
+
+        parquet_stream = tempfile.NamedTemporaryFile(
+            dir=tile_path,
+            prefix=f"{tile}-{catalog}-",
+            suffix=".parquet",
+            delete=False,
+        )
+
+        # the checksum of the parquet is calculated while is written
+        parquet_out = MD5Writer(parquet_stream)
+
+        try:
+            with parquet_stream:
+
+                # big files are downloaded in multiple segments
+                digest = None
+                big_file = size >= SEGMENTED_DOWNLOAD_THRESHOLD
+                if self.download_segments > 1 and big_file:
+                    compressed_path = (
+                        tile_path / f"{catalog}-{md5sum}.bz2.segments"
+                    )
+                    digest = self._segmented_download(
+                        url, size, compressed_path, pbar
+                    )
+                    inline = False
+
+                # the server doesn't support ranges or the file is small
+                if digest is None:
+                    compressed_path = (
+                        tile_path / f"{catalog}-{md5sum}.bz2.part"
+                    )
+                    digest, inline = self._stream_download(
+                        url, size, compressed_path, parquet_out, pbar
+                    )
+
+                # stop the progress bar
+                if own_pbar:
+                    pbar.close()
+
+                # check if the file was download correctly
+                if digest != md5sum:
+                    os.remove(compressed_path)
+                    raise IOError(
+                        f"'{tile}-{catalog}' incorrect download.\n"
+                        f"expected: {md5sum}\n"
+                        f"caclulated: {digest}"
+                    )
+
+                if not inline:
+                    parquet_out.seek(0)
+                    parquet_out.truncate()
+                    bz2_decompress_file(
+                        compressed_path,
+                        parquet_out,
+                        workers=self.decompress_workers,
+                    )
+
+            # the file is ok, so we move it to their final location
+            filename = pathlib.Path(tile) / f"{catalog}-{md5sum}.parquet"
+            os.replace(parquet_stream.name, self.catalogs_path / filename)
+
+        except BaseException:
+            os.remove(parquet_stream.name)
+            raise
+
+        # the compressed data is no longer needed
+        os.remove(compressed_path)
+
+        # only the metadata of the stored file goes to the cache
+        return {
+            "tile": tile,
+            "catalog": catalog,
+            "md5sum": md5sum,
+            "filename": str(filename),
+            "size": (self.catalogs_path / filename).stat().st_size,
+            "parquet_md5sum": parquet_out.hexdigest(),
+        }
+
+    def _check_columns(self, tile, catalog, path, columns):
+        if columns is None:
+            return None
+
+        columns = list(columns)
+        available = pq.read_schema(path).names
+        missing = [c for c in columns if c not in available]
+        if missing:
+            raise ValueError(
+                f"Columns {missing} not found in catalog {tile}-{catalog}"
+            )
+        return columns
+
+    def _download_params(self, tile, catalog):
+        info = self.catalog_info(tile, catalog)
+        return dict(
+            tile=tile,
+            catalog=catalog,
+            url=info["url"],
+            size=info["size"],
+            md5sum=info["md5sum"].split()[0].strip().lower(),
+        )
+
+    def _stored_catalog(self, tile, catalog):
+        key = cache_key("get_catalog", **self._download_params(tile, catalog))
+        meta = self.cache.get(key, default=None, retry=True)
+        return meta if self._is_stored(meta) else None
+
+    def _retrieve_catalog(
+        self, tile, catalog, force=False, pbar=None, touch=True
+    ):
+        function = self._http_download
+        if pbar is not None:
+            function = functools.partial(function, pbar=pbar)
+
+        kwargs = dict(
+            cache=self.cache,
+            tag="get_catalog",
+            function=function,
+            cache_expire=self.cache_expire,
+            # params to _http_download
+            **self._download_params(tile, catalog),
+        )
+
+        identity = (tile, catalog, kwargs["md5sum"])
+        lock = self._download_locks.setdefault(identity, threading.Lock())
+
+        # other thread is retrieving the same catalog, when it ends the
+        # stored file is reused (even if a new download was forced)
+        if not lock.acquire(blocking=False):
+            lock.acquire()
+            force = False
+
+        try:
+            meta = from_cache(force=force, **kwargs)
+            if not self._is_stored(meta):
+                meta = from_cache(force=True, **kwargs)
+        finally:
+            self._release_cache_space(*identity)
+            lock.release()
+
+        if touch:
+            self._touch_catalog(meta)
+        return meta
+
+    def get_catalog(
+        self,
+        tile,
+        catalog,
+        force=False,
+        columns=None,
+        filters=None,
+        as_lightcurves=False,
+        compact=False,
+        backend="pandas",
+    ):
+        """Retrieve a catalog from the carpyncho dataset.
+
+        Parameters
+        ----------
+        tile: str
+            The name of the tile.
+        catalog:
+            The name of the catalog.
+        force: bool (default=False)
+            If its True, the cached version of the catalog is ignored and
+            redownloaded. Try to always set force to False.
+        columns: list of str or None (default=None)
+            If not None, only these columns will be read from the stored
+            catalog. The load time and memory only depends on the selected
+            columns.
+        filters: list of tuples, list of lists of tuples or None
+            (default=None)
+            Rows which do not match the filter predicate will be removed.
+            The syntax is the pyarrow disjunctive normal form (DNF), for
+            example ``[("vs_type", "!=", "")]`` or
+            ``[[("Mean", ">", 12), ("Mean", "<", 16.5)], [("cnt", ">=", 60)]]``
+            The predicates are pushed down to the row-group statistics of the
+            stored parquet file, so the row-groups that can't match are never
+            decoded.
+        as_lightcurves: bool (default=False)
+            If its True the light-curves catalog is returned as a
+            ``LightCurveSet`` with the selected ``columns`` (by default the
+            time, magnitude and magnitude error). The first call sort the
+            catalog by source and time (check ``get_lightcurves``). Can't be
+            combined with ``filters``, ``compact`` or ``backend``.
+        compact: bool (default=False)
+            If its True the columns are read with smaller types to reduce
+            the memory (check ``carpyncho.COMPACT_SCHEMAS``). The integers
+            are downcasted only if the values of the catalog fits in the
+            new type. The conversion is made while the catalog is read, and
+            always with pyarrow.
+        backend: str (default="pandas")
+            The library of the returned catalog: "pandas" (a DataFrame),
+            "arrow" (a ``pyarrow.Table`` read with memory-mapping from the
+            stored parquet file, without a pandas conversion) or "polars"
+            (a lazy ``polars.LazyFrame`` that scan the stored file; requires
+            polars).
+
+        Returns
+        -------
+        pandas.DataFrame, pyarrow.Table, polars.LazyFrame or LightCurveSet:
+            The columns of the DataFrame changes between the different catalog.
+
+        Raises
+        ------
+        ValueError:
+            If the tile or the catalog is not found, some of the columns
+            are not part of the catalog, or ``as_lightcurves`` is combined
+            with an unsupported argument.
+        IOError:
+            If the checksum not match.
+
+        """
+        if backend not in BACKENDS:
+            raise ValueError(
+                f"Invalid backend {backend!r}. Options are {BACKENDS}"
+            )
+
+        if as_lightcurves:
+            if filters is not None:
+                raise ValueError("filters are not supported as light curves")
+            if compact:
+                raise ValueError("compact is not supported as light curves")
+            if backend != "pandas":
+                raise ValueError("backend is not supported as light curves")
+            return self._read_lightcurve_set(tile, catalog, force, columns)
+
+        meta = self._retrieve_catalog(tile, catalog, force=force)
+        path = self.catalogs_path / meta["filename"]
+        columns = self._check_columns(tile, catalog, path, columns)
+
+        if backend == "polars":
+            return self._scan_polars(catalog, path, columns, filters, compact)
+
+        if compact:
+            table = self._read_compact(catalog, path, columns, filters)
+        elif backend == "arrow":
+            table = pq.read_table(
+                path, columns=columns, filters=filters, memory_map=True
+            )
+        else:
+            return self._read_parquet(path, columns=columns, filters=filters)
+
+        if backend == "arrow":
+            return table
+        return table.to_pandas(self_destruct=True, split_blocks=True)
+
+    def download_catalogs(
+        self, catalogs, max_workers=DEFAULT_MAX_WORKERS, force=False
+    ):
+        """Download and store many catalogs in parallel.
+
+        The catalogs already stored are not downloaded again (unless
+        ``force`` is True). The progress of all the downloads is reported in
+        a single progress bar.
+
+        Parameters
+        ----------
+        catalogs: iterable of tuples of two str
+            The pairs ``(tile, catalog)`` to download.
+        max_workers: int (default=4)
+            How many catalogs are downloaded at the same time.
+        force: bool (default=False)
+            If its True, the cached version of the catalogs are ignored and
+            redownloaded. Try to always set force to False.
+
+        Returns
+        -------
+        list of tuples of two str:
+            The pairs ``(tile, catalog)`` that were effectively downloaded.
+
+        Raises
+        ------
+        ValueError:
+            If some tile or catalog is not found.
+        IOError:
+            If some checksum not match.
+
+        """
+        catalogs = list(dict.fromkeys(tuple(tc) for tc in catalogs))
+
+        # this also validates that all the catalogs exists
+        pending = [
+            (tile, catalog)
+            for tile, catalog in catalogs
+            if force or self._stored_catalog(tile, catalog) is None
+        ]
+        total = sum(self.catalog_info(*tc)["size"] for tc in pending)
+        if not pending:
+            return pending
+
+        # bz2 decompression and md5 release the GIL, so threads are enough
+        # to keep all the cores busy.
+        with tqdm.tqdm(
+            total=total,
+            unit="B",
+            unit_scale=True,
+            desc=f"{len(pending)} catalogs",
+        ) as pbar, concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers
+        ) as executor:
+            futures = [
+                executor.submit(
+                    self._retrieve_catalog,
+                    tile,
+                    catalog,
+                    force=force,
+                    pbar=pbar,
+                )
+                for tile, catalog in pending
+            ]
+            for future in concurrent.futures.as_completed(futures):
+                future.result()
+
+        return pending
+
+    def match_catalogs(self, patterns):
+        """Find the catalogs that match the given glob patterns.
+
+        Parameters
+        ----------
+        patterns: iterable of str
+            Patterns with the form ``"tile:catalog"`` (ex: ``"b2*:features"``
+            or ``"b20[1-3]:lc"``). A pattern without catalog (ex: ``"b201"``)
+            matches all the catalogs of the tiles. The hidden tiles (with
+            names starting with "_") only match patterns starting with "_".
+
+        Returns
+        -------
+        list of tuples of two str:
+            The pairs ``(tile, catalog)`` in the order of the index.
+
+        Raises
+        ------
+        ValueError:
+            If some pattern doesn't match any catalog.
+
+        """
+        index = self.index_
+
+        matches = []
+        for pattern in patterns:
+            tile_pattern, _, catalog_pattern = pattern.partition(":")
+            found = [
+                (tile, catalog)
+                for tile in index
+                if tile_pattern.startswith("_") or not tile.startswith("_")
+                if fnmatch.fnmatchcase(tile, tile_pattern)
+                for catalog in index[tile]
+                if fnmatch.fnmatchcase(catalog, catalog_pattern or "*")
+            ]
+            if not found:
+                raise ValueError(
+                    f"Pattern {pattern!r} doesn't match any catalog"
+                )
+            matches.extend(found)
+
+        return list(dict.fromkeys(matches))
+
+    def prefetch(
+        self, patterns, max_workers=DEFAULT_MAX_WORKERS, dry_run=False
+    ):
+        """Download all the catalogs that match the patterns into the cache.
+
+        Useful to warm the cache before a long analysis. Only the catalogs
+        not already stored (or stored with an old md5 checksum) are
+        downloaded.
+
+        Parameters
+        ----------
+        patterns: iterable of str
+            Glob patterns with the form ``"tile:catalog"``
+            (ex: ``"b2*:features"``). Check ``match_catalogs``.
+        max_workers: int (default=4)
+            How many catalogs are downloaded at the same time.
+        dry_run: bool (default=False)
+            If its True nothing is downloaded, only the plan is returned.
+
+        Returns
+        -------
+        dict:
+            ``pending`` are the pairs ``(tile, catalog)`` downloaded (or to
+            download in a dry run), ``stored`` the pairs already in the
+            cache, and ``size`` the total of compressed bytes of the pending
+            catalogs.
+
+        Raises
+        ------
+        ValueError:
+            If some pattern doesn't match any catalog.
+        IOError:
+            If some checksum not match or the catalogs not fit in the cache.
+
+        """
+        pending, stored = [], []
+        for tile, catalog in self.match_catalogs(patterns):
+            if self._stored_catalog(tile, catalog) is None:
+                pending.append((tile, catalog))
+            else:
+                stored.append((tile, catalog))
+
+        size = sum(self.catalog_info(*tc)["size"] for tc in pending)
+        if not dry_run:
+            self.download_catalogs(pending, max_workers=max_workers)
+
+        return {"pending": pending, "stored": stored, "size": size}
+
+    def get_catalogs(
+        self,
+        catalogs,
+        max_workers=DEFAULT_MAX_WORKERS,
+        force=False,
+        columns=None,
+        filters=None,
+        backend="pandas",
+    ):
+        """Retrieve many catalogs from the carpyncho dataset.
+
+        The missing catalogs are downloaded in parallel, and then every
+        catalog is read from the store.
+
+        Parameters
+        ----------
+        catalogs: iterable of tuples of two str
+            The pairs ``(tile, catalog)`` to retrieve.
+        max_workers: int (default=4)
+            How many catalogs are downloaded at the same time.
+        force: bool (default=False)
+            If its True, the cached version of the catalogs are ignored and
+            redownloaded. Try to always set force to False.
+        columns: list of str or None (default=None)
+            If not None, only these columns will be read from every catalog.
+        filters: list of tuples, list of lists of tuples or None
+            (default=None)
+            Filters in DNF applied to every catalog. Check ``get_catalog``.
+        backend: str (default="pandas")
+            The library of the returned catalogs. Check ``get_catalog``.
+
+        Returns
+        -------
+        dict:
+            A catalog of the given backend for every ``(tile, catalog)``
+            pair.
+
+        Raises
+        ------
+        ValueError:
+            If some tile or catalog is not found, or some of the columns
+            are not part of a catalog.
+        IOError:
+            If some checksum not match.
+
+        """
+        catalogs = list(dict.fromkeys(tuple(tc) for tc in catalogs))
+        self.download_catalogs(catalogs, max_workers=max_workers, force=force)
+        return {
+            (tile, catalog): self.get_catalog(
+                tile,
+                catalog,
+                columns=columns,
+                filters=filters,
+                backend=backend,
+            )
+            for tile, catalog in catalogs
+        }
+
+    def _catalog_tiles(self, catalog, tiles):
+        if tiles is None:
+            tiles = [
+                tile
+                for tile in self.list_tiles()
+                if self.has_catalog(tile, catalog)
+            ]
+        tiles = list(dict.fromkeys(tiles))
+        if not tiles:
+            raise ValueError(f"No tiles with the catalog {catalog}")
+        return tiles
+
+    def _catalog_dataset(self, catalog, tiles, max_workers, force):
+        tiles = self._catalog_tiles(catalog, tiles)
+        pairs = [(tile, catalog) for tile in tiles]
+
+        self.download_catalogs(pairs, max_workers=max_workers, force=force)
+        paths = [
+            str(self.catalogs_path / self._retrieve_catalog(*tc)["filename"])
+            for tc in pairs
+        ]
+
+        # the files are stored as <tile>/<catalog>-<md5sum>.parquet so
+        # the tile is the first directory of the path
+        tile_type = pa.dictionary(pa.int32(), pa.string())
+        partitioning = ds.partitioning(
+            pa.schema([("tile", tile_type)]), dictionaries="infer"
+        )
+        return ds.dataset(
+            paths,
+            format="parquet",
+            partitioning=partitioning,
+            partition_base_dir=str(self.catalogs_path),
+        )
+
+    def get_dataset(
+        self,
+        catalog="features",
+        tiles=None,
+        columns=None,
+        filters=None,
+        max_workers=DEFAULT_MAX_WORKERS,
+        force=False,
+    ):
+        """Retrieve a catalog of many tiles as a single DataFrame.
+
+        The catalog of every tile is read as a part of one partitioned
+        dataset, with the extra categorical column ``tile``. Only the
+        selected columns and the rows that match the filters are read, and
+        the result is built without concatenate intermediate DataFrames.
+        The missing catalogs are downloaded in parallel.
+
+        Parameters
+        ----------
+        catalog: str (default="features")
+            The name of the catalog.
+        tiles: iterable of str or None (default=None)
+            The name of the tiles. If its None all the tiles with the
+            catalog are used.
+        columns: list of str or None (default=None)
+            If not None, only these columns will be read. ``tile`` is also
+            a valid column.
+        filters: list of tuples, list of lists of tuples,
+            ``pyarrow.dataset.Expression`` or None (default=None)
+            Filters in DNF applied to the rows (check ``get_catalog``). The
+            column ``tile`` can be used to filter too, ex:
+            ``[("tile", "in", ["b201", "b202"]), ("ra_k", ">", 270)]``.
+        max_workers: int (default=4)
+            How many catalogs are downloaded at the same time.
+        force: bool (default=False)
+            If its True, the cached version of the catalogs are ignored and
+            redownloaded. Try to always set force to False.
+
+        Returns
+        -------
+        pandas.DataFrame:
+            The rows of all the tiles.
+
+        Raises
+        ------
+        ValueError:
+            If some tile or the catalog is not found, or some of the columns
+            are not part of the catalog.
+        IOError:
+            If some checksum not match.
+
+        Notes
+        -----
+        The dataset is always read with pyarrow, independently of the
+        ``parquet_engine``.
+
+        """
+        dataset = self._catalog_dataset(catalog, tiles, max_workers, force)
+
+        if columns is not None:
+            columns = list(columns)
+            missing = [c for c in columns if c not in dataset.schema.names]
+            if missing:
+                raise ValueError(
+                    f"Columns {missing} not found in catalog {catalog}"
+                )
+
+        if filters is not None and not isinstance(filters, ds.Expression):
+            filters = pq.filters_to_expression(filters)
+
+        table = dataset.to_table(columns=columns, filter=filters)
+
+        # the arrow buffers are released as soon as they are converted
+        return table.to_pandas(self_destruct=True, split_blocks=True)
+
+    def iter_catalog(
+        self,
+        tile,
+        catalog,
+        batch_size=DEFAULT_BATCH_SIZE,
+        force=False,
+        columns=None,
+        backend="pandas",
+    ):
+        """Iterate over a catalog of the carpyncho dataset in chunks.
+
+        The catalog is downloaded (if is not already stored) and then read
+        one row-group at the time, so the memory used is bounded by the
+        ``batch_size`` and not by the size of the catalog.
+
+        Parameters
+        ----------
+        tile: str
+            The name of the tile.
+        catalog:
+            The name of the catalog.
+        batch_size: int (default=1_000_000)
+            Maximum number of rows of every chunk.
+        force: bool (default=False)
+            If its True, the cached version of the catalog is ignored and
+            redownloaded. Try to always set force to False.
+        columns: list of str or None (default=None)
+            If not None, only these columns will be read.
+        backend: str (default="pandas")
+            The library of the chunks: "pandas" (a DataFrame), "arrow"
+            (a ``pyarrow.RecordBatch``) or "polars" (a ``polars.DataFrame``;
+            requires polars).
+
+        Yields
+        ------
+        pandas.DataFrame, pyarrow.RecordBatch or polars.DataFrame:
+            Consecutive chunks of the catalog.
+
+        Raises
+        ------
+        ValueError:
+            If the tile or the catalog is not found, or some of the columns
+            are not part of the catalog.
+        IOError:
+            If the checksum not match.
+
+        """
+        if backend == "pandas":
+            convert = pa.RecordBatch.to_pandas
+        elif backend == "arrow":
+            convert = None
+        elif backend == "polars":
+            pl = import_optional("polars", "The 'polars' backend")
+            convert = pl.from_arrow
+        else:
+            raise ValueError(
+                f"Invalid backend {backend!r}. Options are {BACKENDS}"
+            )
+
+        meta = self._retrieve_catalog(tile, catalog, force=force)
+        path = self.catalogs_path / meta["filename"]
+        columns = self._check_columns(tile, catalog, path, columns)
+
+        with pq.ParquetFile(path, memory_map=True) as pfile:
+            batches = pfile.iter_batches(
+                batch_size=batch_size, columns=columns
+            )
+            for batch in batches:
+                yield batch if convert is None else convert(batch)
+
+    # =========================================================================
+    # LIGHT CURVES
+    # =========================================================================
+
+    def _build_lightcurve_index(self, tile, catalog, md5sum, filename):
+        src_path = self.catalogs_path / filename
+        tile_path = src_path.parent
+
+        # the sorted copy has the same size of the catalog
+        required = src_path.stat().st_size
+        with self._reserve_cache_space(required, tile, catalog, md5sum):
+            # sort the entire catalog by source and time
+            table = pq.read_table(src_path, memory_map=True)
+            table = table.sort_by(
+                [(LC_ID, "ascending"), (LC_TIME, "ascending")]
+            )
+
+            # where every source starts and ends
+            ids = table[LC_ID].to_numpy()
+            is_start = np.ones(len(ids), dtype=bool)
+            is_start[1:] = ids[1:] != ids[:-1]
+            starts = np.flatnonzero(is_start)
+            offsets = np.append(starts, len(ids))
+
+            # where every row-group starts
+            rg_offsets = np.arange(0, len(ids), LIGHTCURVE_ROW_GROUP_SIZE)
+            rg_offsets = np.append(rg_offsets, len(ids))
+
+            sorted_filename = (
+                pathlib.Path(tile) / f"{catalog}-{md5sum}.sorted.parquet"
+            )
+            index_filename = (
+                pathlib.Path(tile) / f"{catalog}-{md5sum}.index.npz"
+            )
+
+            tmp_files = []
+            try:
+                with tempfile.NamedTemporaryFile(
+                    dir=tile_path, suffix=".parquet", delete=False
+                ) as sorted_fp:
+                    tmp_files.append(sorted_fp.name)
+                    pq.write_table(
+                        table,
+                        sorted_fp,
+                        row_group_size=LIGHTCURVE_ROW_GROUP_SIZE,
+                    )
+
+                with tempfile.NamedTemporaryFile(
+                    dir=tile_path, suffix=".npz", delete=False
+                ) as index_fp:
+                    tmp_files.append(index_fp.name)
+                    np.savez(
+                        index_fp,
+                        ids=ids[starts],
+                        offsets=offsets,
+                        rg_offsets=rg_offsets,
+                    )
+
+                os.replace(
+                    sorted_fp.name, self.catalogs_path / sorted_filename
+                )
+                os.replace(index_fp.name, self.catalogs_path / index_filename)
+
+            except BaseException:
+                for tmp in tmp_files:
+                    if os.path.exists(tmp):
+                        os.remove(tmp)
+                raise
+
+        return {
+            "tile": tile,
+            "catalog": catalog,
+            "md5sum": md5sum,
+            "filename": str(sorted_filename),
+            "index_filename": str(index_filename),
+        }
+
+    def _retrieve_lightcurve_index(self, tile, catalog, force=False):
+        meta = self._retrieve_catalog(tile, catalog, force=force)
+
+        kwargs = dict(
+            cache=self.cache,
+            tag="get_lightcurve_index",
+            function=self._build_lightcurve_index,
+            cache_expire=self.cache_expire,
+            # params to _build_lightcurve_index
+            tile=tile,
+            catalog=catalog,
+            md5sum=meta["md5sum"],
+            filename=meta["filename"],
+        )
+
+        lc_meta = from_cache(force=force, **kwargs)
+
+        # some of the files may be removed by hand.
+        paths = [
+            self.catalogs_path / lc_meta["filename"],
+            self.catalogs_path / lc_meta["index_filename"],
+        ]
+        if not all(path.exists() for path in paths):
+            lc_meta = from_cache(force=True, **kwargs)
+
+        return lc_meta
+
+    def _read_lightcurve_set(self, tile, catalog, force, columns):
+        lc_meta = self._retrieve_lightcurve_index(tile, catalog, force=force)
+        path = self.catalogs_path / lc_meta["filename"]
+
+        columns = [LC_TIME, LC_MAG, LC_MAG_ERR] if columns is None else columns
+        columns = self._check_columns(tile, catalog, path, columns)
+
+        table = pq.read_table(path, columns=columns, memory_map=True)
+        with np.load(self.catalogs_path / lc_meta["index_filename"]) as index:
+            ids, offsets = index["ids"], index["offsets"]
+
+        return LightCurveSet(
+            ids=ids,
+            offsets=offsets,
+            data={c: table[c].to_numpy() for c in columns},
+        )
+
+    def get_lightcurves(self, tile, ids, catalog="lc", columns=None):
+        """Retrieve the light curves of the given sources.
+
+        The first call for a given catalog sort the catalog by source and
+        time, and builds an on-disk index from ``bm_src_id`` to the rows of
+        every source. After that, only the row-groups that contains the
+        requested sources are read.
+
+        Parameters
+        ----------
+        tile: str
+            The name of the tile.
+        ids: array-like of int
+            The ``bm_src_id`` of the sources. The ids without a light
+            curve are ignored.
+        catalog: str (default="lc")
+            The name of the light curve catalog.
+        columns: list of str or None (default=None)
+            If not None, only these columns will be read.
+
+        Returns
+        -------
+        pandas.DataFrame:
+            The observations of all the sources, sorted by ``bm_src_id`` and
+            ``pwp_stack_src_hjd``.
+
+        Raises
+        ------
+        ValueError:
+            If the tile or the catalog is not found, or some of the columns
+            are not part of the catalog.
+        IOError:
+            If the checksum not match.
+
+        """
+        lc_meta = self._retrieve_lightcurve_index(tile, catalog)
+        path = self.catalogs_path / lc_meta["filename"]
+        columns = self._check_columns(tile, catalog, path, columns)
+
+        with np.load(self.catalogs_path / lc_meta["index_filename"]) as index:
+            src_ids = index["ids"]
+            offsets = index["offsets"]
+            rg_offsets = index["rg_offsets"]
+
+        # the position of every requested source in the index
+        ids = np.unique(np.asarray(ids, dtype=src_ids.dtype))
+        positions = np.searchsorted(src_ids, ids)
+        positions = positions[positions < len(src_ids)]
+        positions = positions[np.isin(src_ids[positions], ids)]
+
+        starts, ends = offsets[positions], offsets[positions + 1]
+
+        # the row-groups that contains the sources
+        first_rg = np.searchsorted(rg_offsets, starts, side="right") - 1
+        last_rg = np.searchsorted(rg_offsets, ends - 1, side="right") - 1
+        row_groups = np.unique(
+            [rg for f, lt in zip(first_rg, last_rg) for rg in range(f, lt + 1)]
+        ).astype(int)
+
+        with pq.ParquetFile(path, memory_map=True) as pfile:
+            table = pfile.read_row_groups(row_groups, columns=columns)
+
+        # convert the global row numbers into positions inside the table
+        rg_sizes = rg_offsets[row_groups + 1] - rg_offsets[row_groups]
+        table_offsets = np.cumsum(rg_sizes) - rg_sizes
+        shifts = dict(zip(row_groups, rg_offsets[row_groups] - table_offsets))
+
+        take = [
+            np.arange(start - shifts[rg], end - shifts[rg])
+            for start, end, rg in zip(starts, ends, first_rg)
+        ]
+        take = np.concatenate(take) if take else np.array([], dtype=int)
+
+        return table.take(take).to_pandas()
+
+    def get_lightcurve(self, tile, src_id, catalog="lc", columns=None):
+        """Retrieve the light curve of a single source.
+
+        Parameters
+        ----------
+        tile: str
+            The name of the tile.
+        src_id: int
+            The ``bm_src_id`` of the source.
+        catalog: str (default="lc")
+            The name of the light curve catalog.
+        columns: list of str or None (default=None)
+            If not None, only these columns will be read.
+
+        Returns
+        -------
+        pandas.DataFrame:
+            The observations of the source sorted by ``pwp_stack_src_hjd``.
+
+        Raises
+        ------
+        ValueError:
+            If the tile, the catalog or the source is not found, or some of
+            the columns are not part of the catalog.
+        IOError:
+            If the checksum not match.
+
+        """
+        df = self.get_lightcurves(tile, [src_id], catalog, columns=columns)
+        if df.empty:
+            raise ValueError(f"Source {src_id} not found in {tile}-{catalog}")
+        return df
+
+    # =========================================================================
+    # SKY POSITIONS
+    # =========================================================================
+
+    def _take_rows(self, path, rows, columns=None):
+        # read only the row-groups that contains the rows
+        with pq.ParquetFile(path, memory_map=True) as pfile:
+            metadata = pfile.metadata
+            rg_sizes = np.array(
+                [
+                    metadata.row_group(rg).num_rows
+                    for rg in range(metadata.num_row_groups)
+                ],
+                dtype=int,
+            )
+            rg_offsets = np.append(0, np.cumsum(rg_sizes))
+
+            rows = np.asarray(rows, dtype=int)
+            rows_rg = np.searchsorted(rg_offsets, rows, side="right") - 1
+            row_groups, inverse = np.unique(rows_rg, return_inverse=True)
+            table = pfile.read_row_groups(row_groups, columns=columns)
+
+        # convert the global row numbers into positions inside the table
+        table_offsets = np.cumsum(rg_sizes[row_groups]) - rg_sizes[row_groups]
+        take = rows - rg_offsets[rows_rg] + table_offsets[inverse]
+        return table.take(take).to_pandas()
+
+    def _build_sky_index(self, tile, catalog, md5sum, filename):
+        src_path = self.catalogs_path / filename
+        table = pq.read_table(
+            src_path, columns=[RA_COLUMN, DEC_COLUMN], memory_map=True
+        )
+        xyz = radec_to_xyz(table[RA_COLUMN], table[DEC_COLUMN])
+
+        # the sources without position are not indexed
+        rows = np.flatnonzero(np.isfinite(xyz).all(axis=1))
+        xyz = xyz[rows]
+
+        # the footprint of the tile is the smallest cap centered in the
+        # mean position that contains all the sources
+        center = xyz.sum(axis=0)
+        center = center / np.linalg.norm(center)
+        cos_radius = np.clip(np.min(xyz @ center, initial=1.0), -1, 1)
+        radius = np.degrees(np.arccos(cos_radius)) * 3600.0
+
+        index = {"tree": spatial.cKDTree(xyz), "rows": rows}
+        index_filename = pathlib.Path(tile) / f"{catalog}-{md5sum}.sky.pkl"
+
+        with tempfile.NamedTemporaryFile(
+            dir=src_path.parent, suffix=".pkl", delete=False
+        ) as index_fp:
+            try:
+                pickle.dump(index, index_fp, protocol=pickle.DEFAULT_PROTOCOL)
+            except BaseException:
+                index_fp.close()
+                os.remove(index_fp.name)
+                raise
+        os.replace(index_fp.name, self.catalogs_path / index_filename)
+
+        return {
+            "tile": tile,
+            "catalog": catalog,
+            "md5sum": md5sum,
+            "filename": str(index_filename),
+            "center": center.tolist(),
+            "radius": float(radius),
+        }
+
+    def _retrieve_sky_index(self, tile, catalog, force=False, touch=True):
+        meta = self._retrieve_catalog(tile, catalog, force=force, touch=touch)
+
+        kwargs = dict(
+            cache=self.cache,
+            tag="get_sky_index",
+            function=self._build_sky_index,
+            cache_expire=self.cache_expire,
+            # params to _build_sky_index
+            tile=tile,
+            catalog=catalog,
+            md5sum=meta["md5sum"],
+            filename=meta["filename"],
+        )
+
+        sky_meta = from_cache(force=force, **kwargs)
+
+        # the index may be removed by hand.
+        if not (self.catalogs_path / sky_meta["filename"]).exists():
+            sky_meta = from_cache(force=True, **kwargs)
+
+        return meta, sky_meta
+
+    @functools.lru_cache(maxsize=SKY_INDEX_CACHE_SIZE)
+    def _load_sky_index(self, filename):
+        with open(self.catalogs_path / filename, "rb") as fp:
+            return pickle.load(fp)
+
+    def cone_search(
+        self, ra, dec, radius, catalog="features", tiles=None, columns=None
+    ):
+        """Retrieve all the sources inside a circle of the sky.
+
+        The first search over a catalog builds and stores a spatial index
+        (a KD-tree over the unit vectors of ``ra_k`` and ``dec_k``) and the
+        footprint of every tile. After that, the tiles that doesn't overlap
+        the circle are skipped and only the row-groups with the found
+        sources are read.
+
+        Parameters
+        ----------
+        ra, dec: float
+            Center of the circle in degrees.
+        radius: float
+            Radius of the circle in arcseconds.
+        catalog: str (default="features")
+            The name of the catalog. Must have the columns ``ra_k`` and
+            ``dec_k``.
+        tiles: iterable of str or None (default=None)
+            The name of the tiles to search. If its None all the tiles with
+            the catalog are used (and downloaded if is necessary).
+        columns: list of str or None (default=None)
+            If not None, only these columns will be read.
+
+        Returns
+        -------
+        pandas.DataFrame:
+            The found sources sorted by distance to the center, with two
+            extra columns: ``tile`` and ``separation`` (in arcseconds).
+
+        Raises
+        ------
+        ValueError:
+            If some tile or the catalog is not found, or some of the columns
+            are not part of the catalog.
+        IOError:
+            If some checksum not match.
+
+        """
+        tiles = self._catalog_tiles(catalog, tiles)
+        self.download_catalogs([(tile, catalog) for tile in tiles])
+        center = radec_to_xyz(ra, dec)[0]
+
+        dfs, path = [], None
+        for tile in tiles:
+            # the skipped tiles are not accessed, so their place in the
+            # eviction order doesn't change
+            meta, sky_meta = self._retrieve_sky_index(
+                tile, catalog, touch=False
+            )
+            path = self.catalogs_path / meta["filename"]
+
+            # the circle not overlap the footprint of the tile
+            cos_distance = np.clip(center @ sky_meta["center"], -1, 1)
+            distance = np.degrees(np.arccos(cos_distance)) * 3600.0
+            if distance > sky_meta["radius"] + radius:
+                continue
+
+            self._touch_catalog(meta)
+            columns = self._check_columns(tile, catalog, path, columns)
+
+            index = self._load_sky_index(sky_meta["filename"])
+            tree = index["tree"]
+            found = tree.query_ball_point(center, arcsec_to_chord(radius))
+            found = np.sort(np.asarray(found, dtype=int))
+
+            df = self._take_rows(path, index["rows"][found], columns)
+            df["tile"] = tile
+            df["separation"] = chord_to_arcsec(
+                np.linalg.norm(tree.data[found] - center, axis=1)
+            )
+            dfs.append(df)
+
+        if not dfs:
+            # nothing overlaps, but we keep the columns of the catalog
+            columns = self._check_columns(tile, catalog, path, columns)
+            df = self._take_rows(path, [], columns)
+            return df.assign(tile=pd.Series(dtype=str), separation=0.0)
+
+        df = pd.concat(dfs, ignore_index=True)
+        return df.sort_values("separation", ignore_index=True, kind="stable")
+
+    def _crossmatch_tile(self, tile, catalog, xyz, radius):
+        meta, sky_meta = self._retrieve_sky_index(tile, catalog)
+
+        # only the positions near the footprint of the tile are queried
+        reach = np.radians((sky_meta["radius"] + radius) / 3600.0)
+        cos_reach = np.cos(min(reach, np.pi))
+        candidates = np.flatnonzero(xyz @ sky_meta["center"] >= cos_reach)
+
+        index = self._load_sky_index(sky_meta["filename"])
+        tree = index["tree"]
+        dist, found = tree.query(
+            xyz[candidates], k=1, distance_upper_bound=arcsec_to_chord(radius)
+        )
+
+        matched = found < tree.n
+        positions = candidates[matched]
+        rows = index["rows"][found[matched]]
+        return meta, positions, rows, dist[matched]
+
+    def crossmatch(
+        self,
+        df,
+        ra_col="ra",
+        dec_col="dec",
+        radius=1.0,
+        catalog="features",
+        tiles=None,
+        columns=("id",),
+        max_workers=DEFAULT_MAX_WORKERS,
+    ):
+        """Find the nearest source of a catalog for every given position.
+
+        Every tile is matched in parallel using the spatial index of the
+        catalog (check ``cone_search``), and only the positions near the
+        footprint of the tile are queried.
+
+        Parameters
+        ----------
+        df: pandas.DataFrame
+            The positions to match.
+        ra_col, dec_col: str (default="ra", "dec")
+            The columns of ``df`` with the right ascension and declination
+            in degrees.
+        radius: float (default=1.0)
+            Maximum separation of a match in arcseconds.
+        catalog: str (default="features")
+            The name of the catalog. Must have the columns ``ra_k`` and
+            ``dec_k``.
+        tiles: iterable of str or None (default=None)
+            The name of the tiles to match. If its None all the tiles with
+            the catalog are used (and downloaded if is necessary).
+        columns: list of str or None (default=("id",))
+            The columns of the catalog to retrieve for every match. If its
+            None, all the columns are retrieved.
+        max_workers: int (default=4)
+            How many tiles are matched at the same time.
+
+        Returns
+        -------
+        pandas.DataFrame:
+            A row for every row of ``df`` (with the same index), with the
+            ``columns`` of the nearest source, their ``tile`` and
+            ``separation`` in arcseconds. The positions without a match in
+            ``radius`` have null values.
+
+        Raises
+        ------
+        ValueError:
+            If some tile or the catalog is not found, or some of the columns
+            are not part of the catalog.
+        IOError:
+            If some checksum not match.
+
+        """
+        tiles = self._catalog_tiles(catalog, tiles)
+        columns = None if columns is None else list(columns)
+        self.download_catalogs(
+            [(tile, catalog) for tile in tiles], max_workers=max_workers
+        )
+
+        # the positions without coordinates never match
+        xyz = radec_to_xyz(df[ra_col], df[dec_col])
+        valid = np.flatnonzero(np.isfinite(xyz).all(axis=1))
+        valid_xyz = xyz[valid]
+
+        best_dist = np.full(len(xyz), np.inf)
+        best_tile = np.full(len(xyz), -1)
+        best_row = np.full(len(xyz), -1)
+        paths = {}
+
+        # the kd-tree queries release the GIL
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers
+        ) as executor:
+            futures = {
+                executor.submit(
+                    self._crossmatch_tile, tile, catalog, valid_xyz, radius
+                ): tile_idx
+                for tile_idx, tile in enumerate(tiles)
+            }
+            for future in concurrent.futures.as_completed(futures):
+                tile_idx = futures[future]
+                meta, positions, rows, dist = future.result()
+                paths[tile_idx] = self.catalogs_path / meta["filename"]
+
+                # keep the nearest of all the tiles
+                positions = valid[positions]
+                better = dist < best_dist[positions]
+                positions = positions[better]
+                best_dist[positions] = dist[better]
+                best_tile[positions] = tile_idx
+                best_row[positions] = rows[better]
+
+        matches = []
+        for tile_idx, tile in enumerate(tiles):
+            path = paths[tile_idx]
+            columns = self._check_columns(tile, catalog, path, columns)
+            positions = np.flatnonzero(best_tile == tile_idx)
+            match = self._take_rows(path, best_row[positions], columns)
+            match.index = positions
+            match["tile"] = tile
+            matches.append(match)
+
+        matches = [match for match in matches if len(match)] or matches[:1]
+        result = pd.concat(matches).reindex(np.arange(len(xyz)))
+        result["separation"] = np.where(
+            best_tile >= 0, chord_to_arcsec(best_dist), np.nan
+        )
+        result.index = df.index
+        return result
+
+    # =========================================================================
+    # SQL
+    # =========================================================================
+
+    def _sql_views(self):
+        # the index also has the tiles that start with an underscore
+        views = []
+        for tile, catalogs in self.index_.items():
+            for catalog in catalogs:
+                meta = self._stored_catalog(tile, catalog)
+                if meta is not None:
+                    path = self.catalogs_path / meta["filename"]
+                    views.append((tile, catalog, path))
+        return views
+
+    def sql(self, query):
+        """Run a SQL query over the catalogs stored in the cache.
+
+        Every stored catalog is available as a view named
+        ``<tile>.<catalog>`` (for example ``b206.features`` or ``b206.lc``)
+        that reads the parquet file directly, so joins and aggregations
+        run out-of-core and in parallel with DuckDB (requires duckdb).
+        The catalogs are not downloaded; use ``download_catalogs`` or
+        ``prefetch`` before.
 
         Parameters
         ----------
-        tile: str
-            The name of the tile.
-        catalog:
-            The name of the catalog.
+        query: str
+            The SQL query in the DuckDB dialect. Names that start with a
+            digit or an underscore must be quoted (``"_test".lc``).
 
         Returns
         -------
-        dict:
-            The entire information of the given catalog file. This include
-            url, md5 checksum, size in bytes, number of total records,
-            etc.
+        pandas.DataFrame or None:
+            The result of the query, or None if the query returns no rows
+            (for example a ``SET`` statement).
 
         Raises
         ------
-        ValueError:
-            If the tile or the catalog is not found.
+        ImportError:
+            If duckdb is not installed.
+
+        Examples
+        --------
+        The light curves of every RRab star of a tile::
+
+            client.sql('''
+                SELECT lc.*
+                FROM b206.lc AS lc
+                JOIN b206.features AS f ON lc.bm_src_id = f.id
+                WHERE f.vs_type = 'RRLyr-RRab'
+            ''')
 
         """
-        index = self.index_
+        duckdb = import_optional("duckdb", "The SQL interface")
+        with duckdb.connect() as con:
+            for tile, catalog, path in self._sql_views():
+                path = str(path).replace("'", "''")
+                con.execute(f'CREATE SCHEMA IF NOT EXISTS "{tile}"')
+                con.execute(
+                    f'CREATE VIEW "{tile}"."{catalog}" AS '
+                    f"SELECT * FROM read_parquet('{path}')"
+                )
+            relation = con.sql(query)
+            return None if relation is None else relation.df()
 
-        if tile not in index:
-            raise ValueError(f"Tile {tile} not found")
 
-        tile = index[tile]
-        if catalog not in tile:
-            raise ValueError(f"Catalog {catalog} for tile {tile} not found")
+# =============================================================================
+# ASYNC CLIENT
+# =============================================================================
 
-        return tile[catalog]
 
-    # =========================================================================
-    # THE DOWNLOAD PART
-    # =========================================================================
+@attr.s(hash=False, frozen=True)
+class AsyncCarpyncho:
+    """Asyncio client to access the *Carpyncho VVV dataset collection*.
 
-    def _http_download(self, tile, catalog, url, size, md5sum):
+    This is a thread-pool wrapper over the blocking ``Carpyncho`` client,
+    not an async HTTP client: the downloads still use ``requests``, and all
+    the blocking work (HTTP, bz2 decompression and parquet parsing) runs in
+    thread pools, so the event loop is never blocked. Concurrent calls over
+    the same catalog wait for a single download.
 
-        # prepare the parameters and download the token
-        session = requests.Session()
+    Parameters
+    ----------
+    client : ``Carpyncho`` (default: ``Carpyncho()``)
+        The synchronous client that do the real work. All the cache and
+        download configuration is taken from here.
+    max_concurrency : ``int`` (default=4)
+        Maximum number of catalogs downloaded or read at the same time.
+        The index queries are never queued behind the catalogs.
+
+    Examples
+    --------
+    .. code-block:: python
+
+        async with carpyncho.AsyncCarpyncho() as aclient:
+            dfs = await asyncio.gather(
+                aclient.get_catalog("b206", "features"),
+                aclient.get_catalog("b214", "features"),
+            )
 
-        # make the real deal request
-        response = session.get(
-            url,
-            stream=True,
+    """
+
+    #: The synchronous client.
+    client: Carpyncho = attr.ib(factory=Carpyncho)
+
+    #: Maximum number of catalogs processed at the same time.
+    max_concurrency: int = attr.ib(default=DEFAULT_MAX_WORKERS)
+
+    @property
+    @functools.lru_cache(maxsize=None)
+    def _catalogs_executor(self):
+        return concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix="carpyncho-catalogs",
         )
 
-        # progress bar
-        pbar = tqdm.tqdm(
-            total=size,
-            initial=0,
-            unit="B",
-            unit_scale=True,
-            desc=f"{tile}-{catalog}",
+    @property
+    @functools.lru_cache(maxsize=None)
+    def _index_executor(self):
+        return concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="carpyncho-index"
         )
 
-        # the file is a bz2 file, we are going to decompress and store
-        # the raw parquet data into a BytesIO
-        decompressor = bz2.BZ2Decompressor()
-        parquet_stream = io.BytesIO()
+    async def _run(self, executor, function, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        call = functools.partial(function, *args, **kwargs)
+        return await loop.run_in_executor(executor, call)
 
-        # ademas necesitamos fijarnos que el md5 este ok
-        file_hash = hashlib.md5()
+    async def __aenter__(self):
+        """Return the client itself."""
+        return self
 
-        # retrive all the data one chunk at the time
-        for chunk in response.iter_content(CHUNK_SIZE):
+    async def __aexit__(self, *exc_info):
+        """Shutdown the thread pools of the client."""
+        self.close()
 
-            if not chunk:
-                break
+    def close(self):
+        """Shutdown the thread pools of the client.
 
-            decompressed = decompressor.decompress(chunk)
-            parquet_stream.write(decompressed)
+        The client can't be used after this method is called.
 
-            file_hash.update(chunk)
-            pbar.update(CHUNK_SIZE)
+        """
+        self._catalogs_executor.shutdown(wait=False)
+        self._index_executor.shutdown(wait=False)
 
-        # stop the progress bar
-        pbar.close()
+    # =========================================================================
+    # INDEX
+    # =========================================================================
 
-        # check if the file was download correctly
-        if file_hash.hexdigest() != md5sum:
-            raise IOError(
-                f"'{tile}-{catalog}' incorrect download.\n"
-                f"expected: {md5sum}\n"
-                f"caclulated: {file_hash.hexdigest()}"
-            )
+    async def retrieve_index(self, reset):
+        """Coroutine version of ``Carpyncho.retrieve_index``."""
+        return await self._run(
+            self._index_executor, self.client.retrieve_index, reset
+        )
 
-        # read the entire stream into a dataframe
-        parquet_stream.seek(0)
-        df = pd.read_parquet(parquet_stream, engine=self.parquet_engine)
-        return df
+    async def list_tiles(self):
+        """Coroutine version of ``Carpyncho.list_tiles``."""
+        return await self._run(self._index_executor, self.client.list_tiles)
 
-    def get_catalog(self, tile, catalog, force=False):
-        """Retrieve a catalog from the carpyncho dataset.
+    async def list_catalogs(self, tile):
+        """Coroutine version of ``Carpyncho.list_catalogs``."""
+        return await self._run(
+            self._index_executor, self.client.list_catalogs, tile
+        )
+
+    async def has_catalog(self, tile, catalog):
+        """Coroutine version of ``Carpyncho.has_catalog``."""
+        return await self._run(
+            self._index_executor, self.client.has_catalog, tile, catalog
+        )
+
+    async def catalog_info(self, tile, catalog):
+        """Coroutine version of ``Carpyncho.catalog_info``."""
+        return await self._run(
+            self._index_executor, self.client.catalog_info, tile, catalog
+        )
+
+    # =========================================================================
+    # CATALOGS
+    # =========================================================================
+
+    async def get_catalog(self, tile, catalog, **kwargs):
+        """Coroutine version of ``Carpyncho.get_catalog``.
+
+        All the keyword arguments are passed to ``Carpyncho.get_catalog``.
+
+        """
+        return await self._run(
+            self._catalogs_executor,
+            self.client.get_catalog,
+            tile,
+            catalog,
+            **kwargs,
+        )
+
+    async def get_catalogs(self, catalogs, **kwargs):
+        """Retrieve many catalogs concurrently.
 
         Parameters
         ----------
-        tile: str
-            The name of the tile.
-        catalog:
-            The name of the catalog.
-        force: bool (default=False)
-            If its True, the cached version of the catalog is ignored and
-            redownloaded. Try to always set force to False.
+        catalogs: iterable of tuples of two str
+            The pairs ``(tile, catalog)`` to retrieve.
+        kwargs:
+            Passed to ``Carpyncho.get_catalog``.
 
         Returns
         -------
-        pandas.DataFrame:
-            The columns of the DataFrame changes between the different catalog.
-
-        Raises
-        ------
-        ValueError:
-            If the tile or the catalog is not found.
-        IOError:
-            If the checksum not match.
+        dict:
+            A ``pandas.DataFrame`` for every ``(tile, catalog)`` pair.
 
         """
-        info = self.catalog_info(tile, catalog)
-        url, size = info["url"], info["size"]
-        md5sum = info["md5sum"].split()[0].strip().lower()
-
-        df = from_cache(
-            cache=self.cache,
-            tag="get_catalog",
-            function=self._http_download,
-            cache_expire=self.cache_expire,
-            force=force,
-            # params to _http_download
-            tile=tile,
-            catalog=catalog,
-            url=url,
-            size=size,
-            md5sum=md5sum,
+        catalogs = list(dict.fromkeys(tuple(tc) for tc in catalogs))
+        dfs = await asyncio.gather(
+            *(self.get_catalog(*tc, **kwargs) for tc in catalogs)
         )
-
-        return df
+        return dict(zip(catalogs, dfs))
 
 
 # =============================================================================
@@ -504,12 +3350,53 @@ class CLI:
         index_url: str = typer.Option(
             default=CARPYNCHO_INDEX_URL, help="Path of the index.json file"
         ),
+        decompress_workers: int = typer.Option(
+            default=DEFAULT_DECOMPRESS_WORKERS,
+            help="Number of threads used to decompress the catalogs.",
+        ),
+        download_segments: int = typer.Option(
+            default=DEFAULT_DOWNLOAD_SEGMENTS,
+            help="Number of concurrent segments to download big catalogs.",
+        ),
+        http_timeout: float = typer.Option(
+            default=DEFAULT_HTTP_TIMEOUT,
+            help="Seconds to wait for the server to connect or send data.",
+        ),
+        http_retries: int = typer.Option(
+            default=DEFAULT_HTTP_RETRIES,
+            help="How many times a failed HTTP request is retried.",
+        ),
+        cache_size_limit: int = typer.Option(
+            default=DEFAULT_CACHE_SIZE_LIMIT,
+            help="Maximum size in bytes of the stored catalogs.",
+        ),
+        eviction_policy: str = typer.Option(
+            default=DEFAULT_EVICTION_POLICY,
+            help=(
+                "Which catalogs are removed first when the cache is full: "
+                "'lru', 'lfu' or 'none'."
+            ),
+        ),
+        pinned_tiles: t.Optional[t.List[str]] = typer.Option(
+            default=None,
+            help=(
+                "Tile whose catalogs are never removed to free space. "
+                "Can be used multiple times."
+            ),
+        ),
     ):
         self.client_config.update(
             cache_path=cache_path,
             cache_expire=cache_expire,
             parquet_engine=parquet_engine,
             index_url=index_url,
+            decompress_workers=decompress_workers,
+            download_segments=download_segments,
+            http_timeout=http_timeout,
+            http_retries=http_retries,
+            cache_size_limit=cache_size_limit,
+            eviction_policy=eviction_policy,
+            pinned_tiles=pinned_tiles or (),
         )
 
     def version(self):
@@ -598,6 +3485,21 @@ class CLI:
                 "'.pkl' (Python pickle) and '.parquet'"
             ),
         ),
+        columns: t.Optional[t.List[str]] = typer.Option(
+            default=None,
+            help=(
+                "Column to retrieve. Can be used multiple times. "
+                "By default all the columns are retrieved."
+            ),
+        ),
+        compression: t.Optional[str] = typer.Option(
+            default=None,
+            help=(
+                "Compress the '.csv' or '.parquet' output. "
+                f"Options are {', '.join(EXPORT_COMPRESSIONS)}. By default "
+                "is inferred from the '.csv.gz' and '.csv.zst' extensions."
+            ),
+        ),
     ):
         """Retrives a catalog from th Carpyncho dataset collection.
 
@@ -610,27 +3512,391 @@ class CLI:
         force:
             Download a new version of the catalog even if it already exists in
             the cache.
+        columns:
+            Only store these columns.
+        compression:
+            Compression of the output. The '.csv' file is compressed entirely
+            and the '.parquet' file internally.
 
         """
         PARSERS = {
-            ".xlsx": pd.DataFrame.to_excel,
-            ".csv": pd.DataFrame.to_csv,
-            ".pkl": pd.DataFrame.to_pickle,
-            ".parquet": pd.DataFrame.to_parquet,
+            ".xlsx": self._write_excel,
+            ".csv": self._write_csv,
+            ".pkl": self._write_pickle,
+            ".parquet": self._write_parquet,
         }
 
-        client = Carpyncho(**self.client_config)
+        root, ext = os.path.splitext(out.lower())
 
-        df = client.get_catalog(tile, catalog, force=force)
+        # 'catalog.csv.gz' is a csv compressed with gzip
+        suffixes = {v: k for k, v in EXPORT_COMPRESSIONS.items()}
+        if ext in suffixes and root.endswith(".csv"):
+            ext, compression = ".csv", compression or suffixes[ext]
 
-        ext = os.path.splitext(out)[-1].lower()
         if ext not in PARSERS:
             typer.echo(f"format '{ext}' not recognized", err=True)
             raise typer.Exit()
 
+        if compression not in (None, *EXPORT_COMPRESSIONS):
+            typer.echo(f"compression '{compression}' not recognized", err=True)
+            raise typer.Exit(code=1)
+        elif compression and ext not in (".csv", ".parquet"):
+            typer.echo(f"format '{ext}' can't be compressed", err=True)
+            raise typer.Exit(code=1)
+
+        client = Carpyncho(**self.client_config)
+
+        # check the limit of excel before download anything
+        records = client.catalog_info(tile, catalog)["records"]
+        if ext == ".xlsx" and records > EXCEL_MAX_ROWS:
+            typer.echo(
+                f"Catalog {tile}-{catalog} has {records} rows but an Excel "
+                f"sheet supports only {EXCEL_MAX_ROWS}. "
+                "Use '.csv' or '.parquet' instead",
+                err=True,
+            )
+            raise typer.Exit(code=1)
+
+        batches = client.iter_catalog(
+            tile,
+            catalog,
+            force=force,
+            columns=columns or None,
+            backend="arrow",
+        )
+        first = next(batches, None)
+        if first is None:
+            # an empty catalog has no batches, but still has columns
+            table = client.get_catalog(
+                tile, catalog, columns=columns or None, backend="arrow"
+            )
+            first = pa.RecordBatch.from_pylist([], schema=table.schema)
+
         typer.echo(f"Writing {out}...")
         parser = PARSERS[ext]
-        parser(df, out)
+        parser(
+            first.schema, itertools.chain([first], batches), out, compression
+        )
+
+    def _write_csv(self, schema, batches, out, compression):
+        with contextlib.ExitStack() as stack:
+            sink = stack.enter_context(pa.OSFile(out, "wb"))
+            if compression:
+                sink = stack.enter_context(
+                    pa.CompressedOutputStream(sink, compression)
+                )
+
+            # every batch is formatted by pandas, so the file is the same of
+            # DataFrame.to_csv (with the index) without the entire catalog
+            # in memory
+            start, header = 0, True
+            for batch in batches:
+                df = batch.to_pandas()
+                df.index = pd.RangeIndex(start, start + len(df))
+                sink.write(df.to_csv(header=header).encode())
+                start, header = start + len(df), False
+
+    def _write_parquet(self, schema, batches, out, compression):
+        compression = compression or "snappy"
+        with pq.ParquetWriter(out, schema, compression=compression) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+
+    def _write_excel(self, schema, batches, out, compression):
+        # excel and pickle can't be written in chunks
+        df = pa.Table.from_batches(batches, schema=schema).to_pandas()
+        df.to_excel(out)
+
+    def _write_pickle(self, schema, batches, out, compression):
+        df = pa.Table.from_batches(batches, schema=schema).to_pandas()
+        df.to_pickle(out)
+
+    def _download_many(self, client, catalogs, max_workers, force):
+        downloaded = client.download_catalogs(
+            catalogs, max_workers=max_workers, force=force
+        )
+        msg = typer.style(
+            f"{len(downloaded)} catalogs downloaded, "
+            f"{len(catalogs) - len(downloaded)} already stored",
+            fg=typer.colors.GREEN,
+        )
+        typer.echo(msg)
+
+    def download_many(
+        self,
+        catalogs: t.List[str] = typer.Argument(
+            ..., help="The catalogs to download as 'tile:catalog'"
+        ),
+        max_workers: int = typer.Option(
+            default=DEFAULT_MAX_WORKERS,
+            help="How many catalogs are downloaded at the same time.",
+        ),
+        force: bool = typer.Option(
+            default=False,
+            help=(
+                "Force to ignore the cached value and redownload the "
+                "catalogs. Try to always set force to False."
+            ),
+        ),
+    ):
+        """Download many catalogs in parallel into the cache.
+
+        catalogs:
+            The catalogs to download as 'tile:catalog' (ex: 'b206:lc').
+        max_workers:
+            How many catalogs are downloaded at the same time.
+        force:
+            Download a new version of the catalogs even if they already
+            exists in the cache.
+
+        """
+        pairs = []
+        for tc in catalogs:
+            tile, sep, catalog = tc.partition(":")
+            if not (tile and sep and catalog):
+                typer.echo(f"Invalid catalog '{tc}'", err=True)
+                raise typer.Exit(code=1)
+            pairs.append((tile, catalog))
+
+        client = Carpyncho(**self.client_config)
+        self._download_many(client, pairs, max_workers, force)
+
+    def download_all(
+        self,
+        max_workers: int = typer.Option(
+            default=DEFAULT_MAX_WORKERS,
+            help="How many catalogs are downloaded at the same time.",
+        ),
+        force: bool = typer.Option(
+            default=False,
+            help=(
+                "Force to ignore the cached value and redownload the "
+                "catalogs. Try to always set force to False."
+            ),
+        ),
+    ):
+        """Download all the catalogs of all the tiles into the cache.
+
+        max_workers:
+            How many catalogs are downloaded at the same time.
+        force:
+            Download a new version of the catalogs even if they already
+            exists in the cache.
+
+        """
+        client = Carpyncho(**self.client_config)
+        pairs = [
+            (tile, catalog)
+            for tile in client.list_tiles()
+            for catalog in client.list_catalogs(tile)
+        ]
+        self._download_many(client, pairs, max_workers, force)
+
+    def prefetch(
+        self,
+        patterns: t.List[str] = typer.Argument(
+            ..., help="Glob patterns of the catalogs as 'tile:catalog'"
+        ),
+        max_workers: int = typer.Option(
+            default=DEFAULT_MAX_WORKERS,
+            help="How many catalogs are downloaded at the same time.",
+        ),
+        dry_run: bool = typer.Option(
+            default=False,
+            help="Only show the catalogs to download.",
+        ),
+    ):
+        """Download the catalogs that match the patterns into the cache.
+
+        patterns:
+            Glob patterns of the catalogs as 'tile:catalog'
+            (ex: 'b2*:features'). If the catalog is not provided all the
+            catalogs of the tiles are downloaded.
+        max_workers:
+            How many catalogs are downloaded at the same time.
+        dry_run:
+            Only show the catalogs to download and their size.
+
+        """
+        naturalsize = functools.partial(humanize.naturalsize, binary=True)
+        client = Carpyncho(**self.client_config)
+
+        try:
+            plan = client.prefetch(patterns, max_workers, dry_run=True)
+        except ValueError as err:
+            typer.echo(str(err), err=True)
+            raise typer.Exit(code=1)
+
+        for tile, catalog in plan["pending"]:
+            size = client.catalog_info(tile, catalog)["size"]
+            typer.echo(f"  - {tile}-{catalog}: {naturalsize(size)}")
+
+        summary = (
+            f"{len(plan['pending'])} catalogs to download "
+            f"({naturalsize(plan['size'])}), "
+            f"{len(plan['stored'])} already stored"
+        )
+        typer.echo(typer.style(summary, fg=typer.colors.GREEN))
+
+        if not dry_run:
+            client.download_catalogs(plan["pending"], max_workers=max_workers)
+
+    def query(
+        self,
+        query: str = typer.Argument(
+            ..., help="The SQL query. Every stored catalog is <tile>.<catalog>"
+        ),
+        out: t.Optional[str] = typer.Option(
+            default=None,
+            help=(
+                "Path to store the result. The extension of the file "
+                "determines the format. Options are '.csv' and '.parquet'. "
+                "By default the result is printed."
+            ),
+        ),
+    ):
+        """Run a SQL query over the catalogs stored in the cache.
+
+        query:
+            The SQL query in the DuckDB dialect. Every stored catalog is a
+            view named <tile>.<catalog> (e.g. b206.features). Requires duckdb.
+        out:
+            The location to store the result.
+
+        """
+        PARSERS = {
+            ".csv": functools.partial(pd.DataFrame.to_csv, index=False),
+            ".parquet": pd.DataFrame.to_parquet,
+        }
+
+        ext = out and os.path.splitext(out)[-1].lower()
+        if out and ext not in PARSERS:
+            typer.echo(f"format '{ext}' not recognized", err=True)
+            raise typer.Exit(code=1)
+
+        client = Carpyncho(**self.client_config)
+        df = client.sql(query)
+        if df is None:
+            return
+        elif out:
+            typer.echo(f"Writing {out}...")
+            PARSERS[ext](df, out)
+        else:
+            typer.echo(df.to_string(index=False))
+
+    def cache_ls(self):
+        """Show the catalogs stored in the cache."""
+        client = Carpyncho(**self.client_config)
+        naturalsize = functools.partial(humanize.naturalsize, binary=True)
+
+        msg = typer.style(
+            f"Cache {client.cache_path}", fg=typer.colors.GREEN, bold=True
+        )
+        typer.echo(msg)
+
+        stored = client.cache_list()
+        for row in stored:
+            last_access = (
+                "never"
+                if row["last_access"] is None
+                else humanize.naturaltime(time.time() - row["last_access"])
+            )
+            typer.echo(
+                f"  - {row['tile']}-{row['catalog']} ({row['md5sum']}): "
+                f"{naturalsize(row['size'])}, last access {last_access}, "
+                f"{row['hits']} hits"
+            )
+
+        total = sum(row["size"] for row in stored)
+        typer.echo(f"{len(stored)} catalogs, {naturalsize(total)}")
+
+    def cache_rm(
+        self,
+        tile: str = typer.Argument(..., help="The name of the tile"),
+        catalog: t.Optional[str] = typer.Argument(
+            None, help="The name of the catalog. By default all of the tile."
+        ),
+    ):
+        """Remove catalogs from the cache.
+
+        tile:
+            The name of the tile.
+        catalog:
+            The name of the catalog. If is not provided, all the catalogs of
+            the tile are removed.
+
+        """
+        client = Carpyncho(**self.client_config)
+        for tile, catalog in client.cache_remove(tile, catalog):
+            typer.echo(f"Removed {tile}-{catalog}")
+
+    def cache_prune(
+        self,
+        older_than: t.Optional[float] = typer.Option(
+            default=None,
+            help="Remove the catalogs not accessed in these seconds.",
+        ),
+        max_size: t.Optional[int] = typer.Option(
+            default=None,
+            help="Remove catalogs until the cache uses at most these bytes.",
+        ),
+    ):
+        """Remove the old or less used catalogs from the cache.
+
+        older_than:
+            Remove the catalogs not accessed in the last 'older_than'
+            seconds.
+        max_size:
+            Remove catalogs, following the eviction policy, until the cache
+            uses at most 'max_size' bytes.
+
+        """
+        if older_than is None and max_size is None:
+            typer.echo("Provide --older-than and/or --max-size", err=True)
+            raise typer.Exit(code=1)
+
+        client = Carpyncho(**self.client_config)
+        removed = client.cache_prune(older_than=older_than, max_size=max_size)
+        for tile, catalog in removed:
+            typer.echo(f"Removed {tile}-{catalog}")
+
+        msg = typer.style(
+            f"{len(removed)} catalogs removed", fg=typer.colors.GREEN
+        )
+        typer.echo(msg)
+
+    def cache_verify(
+        self,
+        remove: bool = typer.Option(
+            default=False,
+            help="Remove the missing and corrupted catalogs from the cache.",
+        ),
+    ):
+        """Check the md5 checksum of the catalogs stored in the cache.
+
+        remove:
+            Remove the missing and corrupted catalogs from the cache, so the
+            next access download them again.
+
+        """
+        COLORS = {
+            "ok": typer.colors.GREEN,
+            "unchecked": typer.colors.YELLOW,
+            "missing": typer.colors.RED,
+            "corrupted": typer.colors.RED,
+        }
+
+        client = Carpyncho(**self.client_config)
+        results = client.cache_verify(remove=remove)
+        for row in results:
+            status = typer.style(row["status"], fg=COLORS[row["status"]])
+            typer.echo(f"  - {row['tile']}-{row['catalog']}: {status}")
+
+        failed = [
+            r for r in results if r["status"] in ("missing", "corrupted")
+        ]
+        if failed and not remove:
+            raise typer.Exit(code=1)
 
 
 def main():
@@ -44,12 +44,16 @@ REQUIREMENTS = [
     "tqdm",
     "typer",
     "humanize",
+    "scipy",
     # formats
     "fastparquet",
     "pyarrow",
     "openpyxl",
 ]
 
+#: Optional dependencies
+EXTRAS_REQUIREMENTS = {"polars": ["polars"], "duckdb": ["duckdb"]}
+
 with open(PATH / "README.md") as fp:
     LONG_DESCRIPTION = fp.read()
 
@@ -97,6 +101,7 @@ def do_setup():
         entry_points={"console_scripts": ["carpyncho=carpyncho:main"]},
         py_modules=["carpyncho", "ez_setup"],
         install_requires=REQUIREMENTS,
+        extras_require=EXTRAS_REQUIREMENTS,
         include_package_data=True,
     )
 
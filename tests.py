@@ -21,13 +21,24 @@ Warning this code is SLOW!
 # IMPORTS
 # =============================================================================
 
+import asyncio
 import atexit
+import bz2
+import concurrent.futures
+import functools
+import hashlib
+import http.server
+import json
 import os
 import pathlib
 import shutil
 import tempfile
+import threading
+import time
 import uuid
 
+import attr
+
 import carpyncho
 
 import humanize
@@ -36,8 +47,13 @@ import numpy as np
 
 import pandas as pd
 
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
 import pytest
 
+import requests
 
 # =============================================================================
 # CONSTANTS
@@ -63,6 +79,7 @@ def client_maker(mocker):
         tuid = str(uuid.uuid1())
         cache_dir = os.path.join(TEST_CACHE_PATH, tuid)
         mocker.patch("carpyncho.DEFAULT_CACHE_DIR", cache_dir)
+        kwargs.setdefault("cache_path", cache_dir)
         client = carpyncho.Carpyncho(**kwargs)
         client.cache.clear()
         return client
@@ -80,6 +97,169 @@ def remote_client(client_maker):
     return client_maker(index_url=carpyncho.CARPYNCHO_INDEX_URL)
 
 
+# =============================================================================
+# LOCAL CATALOG SERVER
+# =============================================================================
+
+
+def make_features(tile, size, seed):
+    random = np.random.default_rng(seed)
+    tile_num = int(tile[1:])
+    return pd.DataFrame(
+        {
+            "id": tile_num * 10**11 + np.arange(size, dtype="int64"),
+            "cnt": random.integers(10, 100, size),
+            "ra_k": 270.0 + tile_num % 10 + random.uniform(0, 1, size),
+            "dec_k": -30.0 + random.uniform(0, 1, size),
+            "vs_type": random.choice(["", "", "", "RRLyr-RRab"], size),
+            "vs_catalog": random.choice(["", "vizier"], size),
+            "Mean": random.uniform(11, 18, size),
+            "Std": random.uniform(0, 1, size),
+        }
+    )
+
+
+def make_lc(features, epochs, seed):
+    random = np.random.default_rng(seed)
+    size = len(features) * epochs
+    df = pd.DataFrame(
+        {
+            "bm_src_id": np.repeat(features.id.values, epochs),
+            "pwp_id": np.tile(np.arange(4600, 4600 + epochs), len(features)),
+            "pwp_stack_src_id": 3 * 10**15 + np.arange(size, dtype="int64"),
+            "pwp_stack_src_hjd": random.uniform(55000, 57000, size),
+            "pwp_stack_src_mag3": random.uniform(11, 18, size),
+            "pwp_stack_src_mag_err3": random.uniform(0, 0.3, size),
+        }
+    )
+    return df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+class CatalogRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """Static file handler with support for "Range: bytes=start-[end]".
+
+    The JSON files are served with an "ETag" header and support
+    "If-None-Match" revalidation.
+
+    """
+
+    #: The "Range" header of every request (None if there is no header)
+    ranges = []
+
+    #: If False the "Range" header is ignored
+    accept_ranges = True
+
+    #: How many of the next requests are answered with a 503 error
+    failures = 0
+
+    def log_message(self, *args, **kwargs):
+        pass
+
+    def do_GET(self):
+        if CatalogRequestHandler.failures:
+            CatalogRequestHandler.failures -= 1
+            return self.send_error(503)
+
+        if self.path.endswith(".json"):
+            return self.send_json()
+
+        range_header = self.headers.get("Range")
+        self.ranges.append(range_header)
+        if range_header is None or not self.accept_ranges:
+            return super().do_GET()
+
+        data = pathlib.Path(self.translate_path(self.path)).read_bytes()
+        first, last = range_header.split("=", 1)[1].split("-")
+        start = int(first)
+        end = int(last) if last else len(data) - 1
+        if start >= len(data):
+            return self.send_error(416)
+
+        stop = end + 1
+        body = data[start:stop]
+        self.send_response(206)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self):
+        data = pathlib.Path(self.translate_path(self.path)).read_bytes()
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture(scope="session")
+def local_server():
+    """Serve a small fake Carpyncho collection from a local HTTP server."""
+    root = pathlib.Path(tempfile.mkdtemp(suffix="_carpyncho_server"))
+    atexit.register(shutil.rmtree, root)
+
+    catalogs = {}
+    for seed, tile in enumerate(["b201", "b202"]):
+        features = make_features(tile, 200, seed)
+        catalogs[(tile, "features")] = features
+        catalogs[(tile, "lc")] = make_lc(features, 15, seed)
+
+    handler = functools.partial(CatalogRequestHandler, directory=str(root))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    index = {}
+    for (tile, catalog), df in catalogs.items():
+        filename = f"{catalog}_{tile}.parquet.bz2"
+        buff = pa.BufferOutputStream()
+        pq.write_table(pa.Table.from_pandas(df), buff, row_group_size=500)
+        data = bz2.compress(buff.getvalue().to_pybytes())
+        (root / filename).write_bytes(data)
+
+        md5sum = hashlib.md5(data).hexdigest()
+        index.setdefault(tile, {})[catalog] = {
+            "hname": catalog.title(),
+            "format": "BZIP2-Parquet",
+            "extension": ".parquet.bz2",
+            "date": "2020-04-14",
+            "md5sum": f"{md5sum}  {filename}",
+            "filename": filename,
+            "url": f"{base_url}/{filename}",
+            "size": len(data),
+            "records": len(df),
+        }
+
+    index_path = root / "index.json"
+    index_path.write_text(json.dumps(index))
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield {
+        "index_url": str(index_path),
+        "base_url": base_url,
+        "catalogs": catalogs,
+        "root": root,
+    }
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def local_client(client_maker, local_server):
+    return client_maker(index_url=local_server["index_url"])
+
+
 # =============================================================================
 # CLIENT TEST
 # =============================================================================
@@ -133,6 +313,1233 @@ def test_get_catalog(client):
     assert isinstance(df, pd.DataFrame)
 
 
+def test_get_catalog_local(local_client, local_server):
+    df = local_client.get_catalog("b201", "features")
+    expected = local_server["catalogs"][("b201", "features")]
+    pd.testing.assert_frame_equal(df, expected)
+
+    # only the final parquet file is left in the store
+    stored = list(local_client.catalogs_path.glob("**/*.parquet"))
+    md5sum = local_client.catalog_info("b201", "features")["md5sum"][:32]
+    assert [p.name for p in stored] == [f"features-{md5sum}.parquet"]
+
+
+def test_get_catalog_store(local_client, local_server, mocker):
+    first = local_client.get_catalog("b201", "lc")
+
+    # the warm read never touches the network
+    download = mocker.patch.object(carpyncho.Carpyncho, "_http_download")
+    second = local_client.get_catalog("b201", "lc")
+    download.assert_not_called()
+    pd.testing.assert_frame_equal(first, second)
+
+    # the cache only holds the metadata of the stored file
+    with local_client.cache as cache:
+        values = [cache[k] for k in cache]
+    meta = next(v for v in values if v.get("catalog") == "lc")
+    path = local_client.catalogs_path / meta["filename"]
+    assert meta["size"] == path.stat().st_size
+
+
+def test_get_catalog_store_missing_file(local_client, local_server):
+    local_client.get_catalog("b201", "features")
+    for path in local_client.catalogs_path.glob("**/*.parquet"):
+        path.unlink()
+
+    df = local_client.get_catalog("b201", "features")
+    expected = local_server["catalogs"][("b201", "features")]
+    pd.testing.assert_frame_equal(df, expected)
+
+
+def test_get_catalog_columns(local_client, local_server):
+    columns = ["id", "ra_k", "dec_k", "vs_type"]
+    df = local_client.get_catalog("b201", "features", columns=columns)
+    expected = local_server["catalogs"][("b201", "features")][columns]
+    pd.testing.assert_frame_equal(df, expected)
+
+    with pytest.raises(ValueError):
+        local_client.get_catalog("b201", "features", columns=["id", "foo"])
+
+
+@pytest.mark.parametrize("engine", ["pyarrow", "fastparquet"])
+def test_get_catalog_filters(client_maker, local_server, engine):
+    client = client_maker(
+        index_url=local_server["index_url"], parquet_engine=engine
+    )
+    lc = local_server["catalogs"][("b201", "lc")]
+    src_id = lc.bm_src_id.iloc[0]
+
+    filters = [
+        [("bm_src_id", "==", src_id)],
+        [("pwp_stack_src_mag3", ">", 17.5), ("pwp_id", "in", [4600, 4601])],
+    ]
+    df = client.get_catalog("b201", "lc", filters=filters)
+
+    in_source = lc.bm_src_id == src_id
+    bright = (lc.pwp_stack_src_mag3 > 17.5) & lc.pwp_id.isin([4600, 4601])
+    expected = lc[in_source | bright]
+    np.testing.assert_array_equal(
+        df.pwp_stack_src_id.values, expected.pwp_stack_src_id.values
+    )
+
+
+def test_iter_catalog(local_client, local_server):
+    expected = local_server["catalogs"][("b201", "lc")]
+
+    chunks = list(local_client.iter_catalog("b201", "lc", batch_size=700))
+    assert all(isinstance(c, pd.DataFrame) for c in chunks)
+    assert max(len(c) for c in chunks) <= 700
+
+    df = pd.concat(chunks, ignore_index=True)
+    pd.testing.assert_frame_equal(df, expected)
+
+    columns = ["bm_src_id", "pwp_stack_src_mag3"]
+    chunks = local_client.iter_catalog("b201", "lc", columns=columns)
+    df = pd.concat(chunks, ignore_index=True)
+    pd.testing.assert_frame_equal(df, expected[columns])
+
+    with pytest.raises(ValueError):
+        next(local_client.iter_catalog("b201", "lc", columns=["foo"]))
+
+    batches = list(
+        local_client.iter_catalog(
+            "b201", "lc", batch_size=700, backend="arrow"
+        )
+    )
+    assert all(isinstance(b, pa.RecordBatch) for b in batches)
+    df = pa.Table.from_batches(batches).to_pandas()
+    pd.testing.assert_frame_equal(df, expected)
+
+    with pytest.raises(ValueError):
+        next(local_client.iter_catalog("b201", "lc", backend="foo"))
+
+
+def test_get_lightcurves(local_client, local_server, mocker):
+    mocker.patch("carpyncho.LIGHTCURVE_ROW_GROUP_SIZE", 40)
+    lc = local_server["catalogs"][("b201", "lc")]
+    ids = lc.bm_src_id.unique()[[3, 50, 51, 120]]
+
+    df = local_client.get_lightcurves("b201", list(ids) + [-1])
+
+    expected = lc[lc.bm_src_id.isin(ids)].sort_values(
+        ["bm_src_id", "pwp_stack_src_hjd"]
+    )
+    np.testing.assert_array_equal(
+        df.pwp_stack_src_id.values, expected.pwp_stack_src_id.values
+    )
+
+    # the index is built only once
+    build = mocker.spy(carpyncho.Carpyncho, "_build_lightcurve_index")
+    single = local_client.get_lightcurve("b201", ids[0])
+    build.assert_not_called()
+    assert (single.bm_src_id == ids[0]).all()
+    assert single.pwp_stack_src_hjd.is_monotonic_increasing
+    assert len(single) == (lc.bm_src_id == ids[0]).sum()
+
+    with pytest.raises(ValueError):
+        local_client.get_lightcurve("b201", -1)
+
+
+def test_get_lightcurves_empty(local_client):
+    df = local_client.get_lightcurves("b201", [], columns=["bm_src_id"])
+    assert df.empty
+    assert list(df.columns) == ["bm_src_id"]
+
+
+def test_get_catalog_as_lightcurves(local_client, local_server):
+    lc = local_server["catalogs"][("b202", "lc")]
+    lcs = local_client.get_catalog("b202", "lc", as_lightcurves=True)
+
+    groups = lc.groupby("bm_src_id")
+    np.testing.assert_array_equal(lcs.ids, groups.size().index)
+    np.testing.assert_array_equal(lcs.counts(), groups.size())
+    np.testing.assert_allclose(lcs.mean(), groups.pwp_stack_src_mag3.mean())
+    np.testing.assert_allclose(
+        lcs.time_span(),
+        groups.pwp_stack_src_hjd.max() - groups.pwp_stack_src_hjd.min(),
+    )
+
+    summary = lcs.summary()
+    assert list(summary.columns) == ["count", "mean_mag", "time_span"]
+    assert summary.index.name == "bm_src_id"
+
+    # every source is a view of the arrays
+    src_id = lcs.ids[7]
+    source = lcs[src_id]
+    expected = lc[lc.bm_src_id == src_id].sort_values("pwp_stack_src_hjd")
+    np.testing.assert_array_equal(
+        source["pwp_stack_src_mag3"], expected.pwp_stack_src_mag3
+    )
+    assert source["pwp_stack_src_hjd"].base is not None
+    assert np.shares_memory(
+        source["pwp_stack_src_hjd"], lcs.data["pwp_stack_src_hjd"]
+    )
+
+    assert src_id in lcs and -1 not in lcs
+    with pytest.raises(KeyError):
+        lcs[-1]
+
+    assert len(lcs) == len(list(lcs)) == lc.bm_src_id.nunique()
+    assert "sources=200" in repr(lcs)
+
+    for kwargs in [{"filters": []}, {"compact": True}, {"backend": "arrow"}]:
+        with pytest.raises(ValueError):
+            local_client.get_catalog(
+                "b202", "lc", as_lightcurves=True, **kwargs
+            )
+
+
+def test_lightcurve_set_from_frame(local_client, local_server):
+    lc = local_server["catalogs"][("b201", "lc")]
+    lcs = local_client.get_catalog(
+        "b201", "lc", as_lightcurves=True, columns=["pwp_id"]
+    )
+
+    other = carpyncho.LightCurveSet.from_frame(lc, columns=["pwp_id"])
+    np.testing.assert_array_equal(other.ids, lcs.ids)
+    np.testing.assert_array_equal(other.offsets, lcs.offsets)
+    np.testing.assert_array_equal(other.data["pwp_id"], lcs.data["pwp_id"])
+    assert other == lcs
+    assert other != carpyncho.LightCurveSet.from_frame(lc)
+    assert other != carpyncho.LightCurveSet.from_frame(lc[:-1], ["pwp_id"])
+    assert other != "foo"
+
+    df = other.to_frame()
+    assert list(df.columns) == ["bm_src_id", "pwp_id"]
+    assert len(df) == len(lc)
+
+    with pytest.raises(ValueError):
+        local_client.get_catalog(
+            "b201", "lc", as_lightcurves=True, filters=[("pwp_id", ">", 1)]
+        )
+    with pytest.raises(ValueError):
+        carpyncho.LightCurveSet(ids=lcs.ids, offsets=lcs.offsets[1:], data={})
+
+
+def test_get_catalog_compact(local_client, local_server):
+    lc = local_server["catalogs"][("b201", "lc")]
+    df = local_client.get_catalog("b201", "lc", compact=True)
+
+    # the ids doesn't fit in int32
+    assert df.dtypes.to_dict() == {
+        "bm_src_id": np.dtype("int64"),
+        "pwp_id": np.dtype("int32"),
+        "pwp_stack_src_id": np.dtype("int64"),
+        "pwp_stack_src_hjd": np.dtype("float64"),
+        "pwp_stack_src_mag3": np.dtype("float32"),
+        "pwp_stack_src_mag_err3": np.dtype("float32"),
+    }
+    pd.testing.assert_frame_equal(df, lc.astype(df.dtypes.to_dict()))
+
+    features = local_server["catalogs"][("b201", "features")]
+    df = local_client.get_catalog(
+        "b201",
+        "features",
+        compact=True,
+        columns=["vs_type", "id"],
+        filters=[("vs_type", "!=", "")],
+    )
+    assert list(df.columns) == ["vs_type", "id"]
+    assert df.vs_type.dtype == "category"
+    expected = features[features.vs_type != ""]
+    np.testing.assert_array_equal(df.id, expected.id)
+    np.testing.assert_array_equal(df.vs_type.astype(str), expected.vs_type)
+
+    df = local_client.get_catalog(
+        "b201", "lc", compact=True, filters=[("pwp_id", "<", 0)]
+    )
+    assert df.empty and df.pwp_id.dtype == "int32"
+
+
+def test_get_catalog_arrow(local_client, local_server):
+    features = local_server["catalogs"][("b201", "features")]
+    table = local_client.get_catalog("b201", "features", backend="arrow")
+    assert isinstance(table, pa.Table)
+    pd.testing.assert_frame_equal(table.to_pandas(), features)
+
+    table = local_client.get_catalog(
+        "b201",
+        "features",
+        backend="arrow",
+        columns=["id"],
+        filters=[("vs_type", "!=", "")],
+    )
+    assert table.column_names == ["id"]
+    expected = features[features.vs_type != ""]
+    np.testing.assert_array_equal(table["id"], expected.id)
+
+    table = local_client.get_catalog(
+        "b201", "lc", backend="arrow", compact=True
+    )
+    assert table.schema.field("pwp_id").type == pa.int32()
+
+    with pytest.raises(ValueError):
+        local_client.get_catalog(
+            "b201", "lc", backend="arrow", as_lightcurves=True
+        )
+
+    with pytest.raises(ValueError):
+        local_client.get_catalog("b201", "features", backend="foo")
+
+
+def test_get_catalog_polars(local_client, local_server):
+    pl = pytest.importorskip("polars")
+
+    features = local_server["catalogs"][("b201", "features")]
+    frame = local_client.get_catalog("b201", "features", backend="polars")
+    assert isinstance(frame, pl.LazyFrame)
+    pd.testing.assert_frame_equal(
+        frame.collect().to_pandas(), features, check_dtype=False
+    )
+
+    frame = local_client.get_catalog(
+        "b201",
+        "features",
+        backend="polars",
+        columns=["id", "vs_type"],
+        filters=[[("vs_type", "!=", "")], [("id", "in", [features.id[0]])]],
+        compact=True,
+    )
+    df = frame.collect()
+    assert df.columns == ["id", "vs_type"]
+    assert df["vs_type"].dtype == pl.Categorical
+    mask = (features.vs_type != "") | (features.id == features.id[0])
+    np.testing.assert_array_equal(df["id"], features[mask].id)
+
+
+def test_get_catalog_polars_not_installed(local_client, mocker):
+    mocker.patch.dict("sys.modules", {"polars": None})
+    with pytest.raises(ImportError, match="carpyncho\\[polars\\]"):
+        local_client.get_catalog("b201", "features", backend="polars")
+
+
+def test_sql(local_client, local_server):
+    pytest.importorskip("duckdb")
+    features = local_server["catalogs"][("b201", "features")]
+    lc = local_server["catalogs"][("b201", "lc")]
+    local_client.download_catalogs([("b201", "features"), ("b201", "lc")])
+
+    vs_type = features.vs_type[features.vs_type != ""].iloc[0]
+    df = local_client.sql(f"""
+        SELECT lc.bm_src_id, count(*) AS epochs
+        FROM b201.lc AS lc
+        JOIN b201.features AS f ON lc.bm_src_id = f.id
+        WHERE f.vs_type = '{vs_type}'
+        GROUP BY lc.bm_src_id
+        ORDER BY lc.bm_src_id
+        """)
+    ids = features.id[features.vs_type == vs_type]
+    expected = lc[lc.bm_src_id.isin(ids)].groupby("bm_src_id").size()
+    np.testing.assert_array_equal(df.bm_src_id, expected.index)
+    np.testing.assert_array_equal(df.epochs, expected.values)
+
+    assert local_client.sql("SET threads = 1") is None
+
+    # only the stored catalogs are available
+    with pytest.raises(Exception, match="b202"):
+        local_client.sql("SELECT * FROM b202.features")
+
+
+def test_sql_underscore_tile(local_client, local_server, mocker):
+    pytest.importorskip("duckdb")
+    features = local_server["catalogs"][("b201", "features")]
+
+    # a hidden tile with the same catalogs of b201
+    index = dict(local_client.index_, _b201=local_client.index_["b201"])
+    mocker.patch.object(
+        carpyncho.Carpyncho, "retrieve_index", return_value=index
+    )
+    local_client.get_catalog("_b201", "features")
+
+    df = local_client.sql('SELECT count(*) AS total FROM "_b201".features')
+    assert df.total.tolist() == [len(features)]
+
+
+def test_sql_not_installed(local_client, mocker):
+    mocker.patch.dict("sys.modules", {"duckdb": None})
+    with pytest.raises(ImportError, match="carpyncho\\[duckdb\\]"):
+        local_client.sql("SELECT 1")
+
+
+@pytest.mark.parametrize("segments", [1, 3])
+def test_get_catalog_same_catalog_threads(
+    local_client, local_server, mocker, segments
+):
+    mocker.patch("carpyncho.SEGMENTED_DOWNLOAD_THRESHOLD", 0)
+    client = attr.evolve(local_client, download_segments=segments)
+    expected = local_server["catalogs"][("b201", "lc")]
+
+    # slow down the download, so all the threads ask for it at once
+    store_catalog = client._store_catalog
+
+    def slow_store_catalog(*args):
+        time.sleep(0.2)
+        return store_catalog(*args)
+
+    store = mocker.patch.object(
+        carpyncho.Carpyncho, "_store_catalog", side_effect=slow_store_catalog
+    )
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [
+            executor.submit(client.get_catalog, "b201", "lc") for _ in range(4)
+        ]
+        dfs = [future.result() for future in futures]
+
+    assert store.call_count == 1
+    for df in dfs:
+        pd.testing.assert_frame_equal(df, expected)
+
+
+def test_get_catalogs(local_client, local_server, mocker):
+    pairs = [("b201", "features"), ("b202", "features"), ("b202", "lc")]
+    local_client.get_catalog("b201", "features")
+
+    download = mocker.spy(carpyncho.Carpyncho, "_http_download")
+    dfs = local_client.get_catalogs(pairs, max_workers=3)
+
+    assert download.call_count == 2
+    assert list(dfs) == pairs
+    for pair, df in dfs.items():
+        pd.testing.assert_frame_equal(df, local_server["catalogs"][pair])
+
+    assert local_client.download_catalogs(pairs) == []
+
+    with pytest.raises(ValueError):
+        local_client.download_catalogs([("b201", "foo")])
+
+
+def test_get_catalog_decompress_workers(client_maker, local_server):
+    client = client_maker(
+        index_url=local_server["index_url"], decompress_workers=4
+    )
+    df = client.get_catalog("b202", "lc")
+    pd.testing.assert_frame_equal(df, local_server["catalogs"][("b202", "lc")])
+
+    leftovers = list(client.catalogs_path.glob("**/*.bz2"))
+    assert leftovers == []
+
+
+@pytest.fixture
+def server_requests(mocker):
+    mocker.patch.object(CatalogRequestHandler, "ranges", [])
+    return CatalogRequestHandler
+
+
+def make_part(client, server, tile, catalog, fraction):
+    info = client.catalog_info(tile, catalog)
+    data = (server["root"] / info["filename"]).read_bytes()
+    md5sum = info["md5sum"][:32]
+    part_path = client.catalogs_path / tile / f"{catalog}-{md5sum}.bz2.part"
+    part_path.parent.mkdir(parents=True, exist_ok=True)
+    part_path.write_bytes(data[: int(len(data) * fraction)])
+    return part_path, len(data)
+
+
+@pytest.mark.parametrize("decompress_workers", [1, 2])
+def test_get_catalog_resume(
+    client_maker, local_server, server_requests, decompress_workers
+):
+    client = client_maker(
+        index_url=local_server["index_url"],
+        decompress_workers=decompress_workers,
+    )
+    part_path, size = make_part(client, local_server, "b201", "lc", 0.6)
+    resume_from = part_path.stat().st_size
+
+    df = client.get_catalog("b201", "lc")
+
+    pd.testing.assert_frame_equal(df, local_server["catalogs"][("b201", "lc")])
+    assert server_requests.ranges == [f"bytes={resume_from}-"]
+    assert not part_path.exists()
+
+
+def test_get_catalog_resume_complete_part(
+    local_client, local_server, server_requests
+):
+    part_path, _ = make_part(local_client, local_server, "b201", "lc", 1)
+
+    df = local_client.get_catalog("b201", "lc")
+
+    pd.testing.assert_frame_equal(df, local_server["catalogs"][("b201", "lc")])
+    assert server_requests.ranges == []
+
+
+def test_get_catalog_resume_no_range_support(
+    local_client, local_server, server_requests, mocker
+):
+    mocker.patch.object(CatalogRequestHandler, "accept_ranges", False)
+    part_path, _ = make_part(local_client, local_server, "b201", "lc", 0.5)
+
+    df = local_client.get_catalog("b201", "lc")
+
+    pd.testing.assert_frame_equal(df, local_server["catalogs"][("b201", "lc")])
+    assert len(server_requests.ranges) == 1
+    assert not part_path.exists()
+
+
+def test_get_catalog_resume_corrupted_part(
+    local_client, local_server, server_requests
+):
+    part_path, _ = make_part(local_client, local_server, "b201", "lc", 0.5)
+    part_path.write_bytes(b"0" * part_path.stat().st_size)
+
+    with pytest.raises(IOError):
+        local_client.get_catalog("b201", "lc")
+    assert not part_path.exists()
+
+    df = local_client.get_catalog("b201", "lc")
+    pd.testing.assert_frame_equal(df, local_server["catalogs"][("b201", "lc")])
+
+
+def test_get_catalog_interrupted(local_client, local_server, mocker):
+    def iter_content(self, chunk_size):
+        yield self.raw.read(1000)
+        raise requests.ConnectionError("connection lost")
+
+    mocker.patch("requests.Response.iter_content", iter_content)
+
+    with pytest.raises(requests.ConnectionError):
+        local_client.get_catalog("b201", "lc")
+
+    parts = list(local_client.catalogs_path.glob("**/*.part"))
+    assert [p.stat().st_size for p in parts] == [1000]
+    assert list(local_client.catalogs_path.glob("**/*.parquet")) == []
+
+    mocker.stopall()
+    df = local_client.get_catalog("b201", "lc")
+    pd.testing.assert_frame_equal(df, local_server["catalogs"][("b201", "lc")])
+
+
+@pytest.mark.parametrize("decompress_workers", [1, 2])
+def test_get_catalog_segmented(
+    client_maker, local_server, server_requests, mocker, decompress_workers
+):
+    mocker.patch("carpyncho.SEGMENTED_DOWNLOAD_THRESHOLD", 0)
+    client = client_maker(
+        index_url=local_server["index_url"],
+        download_segments=3,
+        decompress_workers=decompress_workers,
+    )
+    size = client.catalog_info("b201", "lc")["size"]
+    step = -(-size // 3)
+
+    df = client.get_catalog("b201", "lc")
+
+    pd.testing.assert_frame_equal(df, local_server["catalogs"][("b201", "lc")])
+    assert sorted(server_requests.ranges) == [
+        f"bytes=0-{step - 1}",
+        f"bytes={step}-{2 * step - 1}",
+        f"bytes={2 * step}-{size - 1}",
+    ]
+    assert list(client.catalogs_path.glob("**/*.bz2.*")) == []
+
+
+def test_get_catalog_segmented_resume(
+    client_maker, local_server, server_requests, mocker
+):
+    mocker.patch("carpyncho.SEGMENTED_DOWNLOAD_THRESHOLD", 0)
+    client = client_maker(
+        index_url=local_server["index_url"], download_segments=3
+    )
+    size = client.catalog_info("b201", "lc")["size"]
+    step = -(-size // 3)
+
+    def iter_content(self, chunk_size):
+        yield self.raw.read(1000)
+        raise requests.ConnectionError("connection lost")
+
+    interrupt = mocker.patch("requests.Response.iter_content", iter_content)
+    with pytest.raises(requests.ConnectionError):
+        client.get_catalog("b201", "lc")
+
+    # the downloaded bytes of every segment are kept
+    (progress_path,) = client.catalogs_path.glob("**/*.bz2.segments.json")
+    progress = json.loads(progress_path.read_text())
+    assert [nxt - start for start, _, nxt in progress["segments"]] == [
+        1000
+    ] * 3
+
+    mocker.stop(interrupt)
+    server_requests.ranges.clear()
+    df = client.get_catalog("b201", "lc")
+
+    pd.testing.assert_frame_equal(df, local_server["catalogs"][("b201", "lc")])
+    assert sorted(server_requests.ranges) == [
+        f"bytes=1000-{step - 1}",
+        f"bytes={step + 1000}-{2 * step - 1}",
+        f"bytes={2 * step + 1000}-{size - 1}",
+    ]
+    assert list(client.catalogs_path.glob("**/*.bz2.*")) == []
+
+
+@pytest.mark.parametrize(
+    "decompress_workers, segments", [(1, 1), (2, 1), (1, 3), (2, 3)]
+)
+def test_get_catalog_parquet_md5sum(
+    client_maker, local_server, mocker, decompress_workers, segments
+):
+    mocker.patch("carpyncho.SEGMENTED_DOWNLOAD_THRESHOLD", 0)
+    client = client_maker(
+        index_url=local_server["index_url"],
+        download_segments=segments,
+        decompress_workers=decompress_workers,
+    )
+    md5_file = mocker.spy(carpyncho, "md5_file")
+
+    client.get_catalog("b201", "lc")
+
+    # the checksum is calculated while the parquet is written
+    assert md5_file.call_count == 0
+    meta = client._stored_catalog("b201", "lc")
+    path = client.catalogs_path / meta["filename"]
+    assert meta["parquet_md5sum"] == hashlib.md5(path.read_bytes()).hexdigest()
+
+
+def test_md5_writer():
+    with tempfile.TemporaryFile() as fp:
+        writer = carpyncho.MD5Writer(fp)
+        writer.write(b"garbage")
+        writer.seek(0)
+        writer.truncate()
+        writer.write(b"foo")
+        writer.write(b"bar")
+        assert writer.seek(0, os.SEEK_END) == 6
+        assert writer.hexdigest() == hashlib.md5(b"foobar").hexdigest()
+
+        with pytest.raises(ValueError):
+            writer.seek(2)
+        assert writer.tell() == 6
+
+
+def test_get_catalog_segmented_no_range_support(
+    client_maker, local_server, server_requests, mocker
+):
+    mocker.patch("carpyncho.SEGMENTED_DOWNLOAD_THRESHOLD", 0)
+    mocker.patch.object(CatalogRequestHandler, "accept_ranges", False)
+    client = client_maker(
+        index_url=local_server["index_url"], download_segments=3
+    )
+
+    df = client.get_catalog("b201", "lc")
+
+    pd.testing.assert_frame_equal(df, local_server["catalogs"][("b201", "lc")])
+    assert len(server_requests.ranges) == 2
+    assert server_requests.ranges[1] is None
+
+
+def test_get_catalog_segmented_small_file(
+    client_maker, local_server, server_requests
+):
+    client = client_maker(
+        index_url=local_server["index_url"], download_segments=3
+    )
+    client.get_catalog("b201", "lc")
+    assert server_requests.ranges == [None]
+
+
+def test_get_catalog_segmented_bad_checksum(
+    client_maker, local_server, mocker
+):
+    mocker.patch("carpyncho.SEGMENTED_DOWNLOAD_THRESHOLD", 0)
+    client = client_maker(
+        index_url=local_server["index_url"], download_segments=3
+    )
+    info = dict(client.catalog_info("b201", "lc"))
+    info["md5sum"] = "0" * 32
+    mocker.patch.object(carpyncho.Carpyncho, "catalog_info", return_value=info)
+
+    with pytest.raises(IOError):
+        client.get_catalog("b201", "lc")
+    assert list(client.catalogs_path.glob("**/*.*")) == []
+
+
+def test_get_catalog_retry(local_client, local_server, mocker):
+    mocker.patch("carpyncho.HTTP_BACKOFF_FACTOR", 0)
+    mocker.patch.object(CatalogRequestHandler, "failures", 3)
+
+    df = local_client.get_catalog("b201", "lc")
+
+    pd.testing.assert_frame_equal(df, local_server["catalogs"][("b201", "lc")])
+    assert CatalogRequestHandler.failures == 0
+
+
+def test_get_catalog_retry_exhausted(client_maker, local_server, mocker):
+    mocker.patch("carpyncho.HTTP_BACKOFF_FACTOR", 0)
+    mocker.patch.object(CatalogRequestHandler, "failures", 3)
+    client = client_maker(index_url=local_server["index_url"], http_retries=2)
+
+    with pytest.raises(requests.HTTPError):
+        client.get_catalog("b201", "lc")
+
+
+def test_session_is_shared(local_client, mocker):
+    session = local_client.session
+    get = mocker.spy(session, "get")
+
+    local_client.get_catalogs([("b201", "lc"), ("b202", "lc")])
+
+    assert local_client.session is session
+    assert get.call_count == 2
+    assert all(
+        c.kwargs["timeout"] == local_client.http_timeout
+        for c in get.call_args_list
+    )
+
+
+def test_index_memoized(client_maker, local_server, mocker):
+    index_url = f"{local_server['base_url']}/index.json"
+    client = client_maker(index_url=index_url)
+    get = mocker.spy(client.session, "get")
+
+    for _ in range(3):
+        assert client.list_tiles() == ("b201", "b202")
+    assert get.call_count == 1
+
+    # a new client reuse the index stored in the cache
+    other = carpyncho.Carpyncho(
+        index_url=index_url, cache_path=client.cache_path
+    )
+    other_get = mocker.spy(other.session, "get")
+    assert other.index_ == client.index_
+    assert other_get.call_count == 0
+
+
+def test_index_revalidate(client_maker, local_server, mocker):
+    index_url = f"{local_server['base_url']}/index.json"
+    client = client_maker(index_url=index_url)
+    index = client.retrieve_index(reset=False)
+
+    get = mocker.spy(client.session, "get")
+    later = time.time() + carpyncho.INDEX_EXPIRE + 1
+    mocker.patch("carpyncho.time.time", return_value=later)
+
+    assert client.retrieve_index(reset=False) == index
+    assert get.call_count == 1
+    assert "If-None-Match" in get.call_args.kwargs["headers"]
+    assert get.spy_return.status_code == 304
+
+    # reset download the index without conditions
+    assert client.retrieve_index(reset=True) == index
+    assert "If-None-Match" not in get.call_args.kwargs["headers"]
+    assert get.spy_return.status_code == 200
+
+
+def test_from_cache_reads_do_not_expire(client_maker, mocker):
+    client = client_maker()
+    expire = mocker.spy(client.cache, "expire")
+
+    def function(value):
+        return value
+
+    kwargs = dict(cache=client.cache, function=function, cache_expire=None)
+    assert carpyncho.from_cache(tag="test", value=1, **kwargs) == 1
+    assert expire.call_count == 1
+
+    # reads and recent writes never scan the cache
+    assert carpyncho.from_cache(tag="test", value=1, **kwargs) == 1
+    assert carpyncho.from_cache(tag="test", value=2, **kwargs) == 2
+    assert expire.call_count == 1
+
+
+def test_cache_maintenance(client_maker, local_server, mocker):
+    client = client_maker(index_url=local_server["index_url"], cache_expire=60)
+    client.get_catalog("b201", "features")
+    client.get_lightcurves("b201", [])
+    stored = client.catalogs_path / "b201"
+    orphan = stored / f"features-{'0' * 32}.parquet"
+    orphan.touch()
+
+    assert client.cache_maintenance() == {"expired": 0, "orphans": 1}
+    assert not orphan.exists()
+
+    later = time.time() + 61
+    mocker.patch("carpyncho.time.time", return_value=later)
+    assert client.cache_maintenance() == {"expired": 3, "orphans": 4}
+    assert list(stored.iterdir()) == []
+
+
+@pytest.mark.parametrize(
+    "policy, pinned, evicted",
+    [("lru", (), "b201"), ("lfu", (), "b202"), ("lru", ("b201",), "b202")],
+)
+def test_cache_eviction(local_client, policy, pinned, evicted):
+    for _ in range(3):
+        local_client.get_catalog("b201", "features")
+    local_client.get_catalog("b202", "features")
+
+    used = sum(
+        local_client._catalog_size(meta)
+        for _, meta in local_client._iter_stored_catalogs()
+    )
+    info = local_client.catalog_info("b201", "lc")
+    required = info["size"] * carpyncho.CATALOG_EXPANSION_RATIO
+    client = attr.evolve(
+        local_client,
+        cache_size_limit=used + required - 1,
+        eviction_policy=policy,
+        pinned_tiles=pinned,
+    )
+    client.get_catalog("b201", "lc")
+
+    (kept,) = {"b201", "b202"} - {evicted}
+    assert client._stored_catalog(evicted, "features") is None
+    assert client._stored_catalog(kept, "features") is not None
+    assert not list(client.catalogs_path.glob(f"{evicted}/features-*"))
+
+
+def test_cache_catalog_does_not_fit(local_client):
+    local_client.get_catalog("b201", "features")
+    info = local_client.catalog_info("b202", "features")
+    required = info["size"] * carpyncho.CATALOG_EXPANSION_RATIO
+
+    client = attr.evolve(
+        local_client, cache_size_limit=required, eviction_policy="none"
+    )
+    with pytest.raises(IOError):
+        client.get_catalog("b202", "features")
+
+    client = attr.evolve(local_client, cache_size_limit=required - 1)
+    with pytest.raises(IOError):
+        client.get_catalog("b202", "features")
+
+    assert client._stored_catalog("b201", "features") is not None
+    assert client._stored_catalog("b202", "features") is None
+
+    # removing the other catalog is enough
+    client = attr.evolve(local_client, cache_size_limit=required)
+    client.get_catalog("b202", "features")
+    assert client._stored_catalog("b201", "features") is None
+
+
+def test_cache_parallel_downloads(local_client, mocker):
+    pairs = [("b201", "features"), ("b201", "lc")]
+    pairs += [("b202", "features"), ("b202", "lc")]
+    sizes = [local_client.catalog_info(*pair)["size"] for pair in pairs]
+    # only one lc catalog fits at the same time
+    limit = (max(sizes) + min(sizes)) * carpyncho.CATALOG_EXPANSION_RATIO
+    client = attr.evolve(local_client, cache_size_limit=limit)
+
+    # slow down the downloads, so all of them run at the same time, and
+    # check the space used on disk while they run
+    peaks = []
+    store_catalog = client._store_catalog
+
+    def slow_store_catalog(*args):
+        time.sleep(0.2)
+        meta = store_catalog(*args)
+        files = client.catalogs_path.glob("*/*")
+        peaks.append(sum(path.stat().st_size for path in files))
+        return meta
+
+    mocker.patch.object(
+        carpyncho.Carpyncho, "_store_catalog", side_effect=slow_store_catalog
+    )
+    downloaded = client.download_catalogs(pairs, max_workers=4)
+
+    assert sorted(downloaded) == pairs
+    assert max(peaks) <= limit
+    assert sum(row["size"] for row in client.cache_list()) <= limit
+    assert client._reservations == {}
+
+
+def test_cache_force_redownload(local_client):
+    local_client.get_catalog("b201", "lc")
+    info = local_client.catalog_info("b201", "lc")
+    required = info["size"] * carpyncho.CATALOG_EXPANSION_RATIO
+
+    # the stored files are replaced, so they don't need space
+    client = attr.evolve(
+        local_client, cache_size_limit=required, eviction_policy="none"
+    )
+    client.get_catalog("b201", "lc", force=True)
+    assert client._stored_catalog("b201", "lc") is not None
+
+
+def test_cache_list_and_remove(local_client):
+    assert local_client.cache_list() == []
+
+    local_client.get_catalog("b201", "features")
+    local_client.get_catalog("b201", "features")
+    local_client.get_lightcurves("b201", [])
+    local_client.get_catalog("b202", "features")
+
+    stored = local_client.cache_list()
+    assert [(r["tile"], r["catalog"], r["hits"]) for r in stored] == [
+        ("b201", "features", 2),
+        ("b201", "lc", 1),
+        ("b202", "features", 1),
+    ]
+    lc_files = local_client.catalogs_path.glob("b201/lc-*")
+    assert stored[1]["size"] == sum(p.stat().st_size for p in lc_files)
+
+    assert sorted(local_client.cache_remove("b201")) == [
+        ("b201", "features"),
+        ("b201", "lc"),
+    ]
+    assert list(local_client.catalogs_path.glob("b201/*")) == []
+    assert [r["tile"] for r in local_client.cache_list()] == ["b202"]
+
+
+def test_cache_prune(local_client, mocker):
+    local_client.get_catalog("b201", "features")
+    local_client.get_catalog("b202", "lc")
+
+    now = time.time()
+    mocker.patch("carpyncho.time.time", return_value=now + 100)
+    local_client.get_catalog("b202", "features")
+
+    assert local_client.cache_prune(older_than=50) == [
+        ("b201", "features"),
+        ("b202", "lc"),
+    ]
+
+    mocker.patch("carpyncho.time.time", return_value=now + 110)
+    local_client.get_catalog("b201", "features")
+    assert local_client.cache_prune(max_size=10**9) == []
+    assert local_client.cache_prune(max_size=0) == [
+        ("b202", "features"),
+        ("b201", "features"),
+    ]
+    assert local_client.cache_list() == []
+
+
+def test_cache_verify(local_client):
+    local_client.get_catalog("b201", "features")
+    local_client.get_catalog("b202", "features")
+    local_client.get_catalog("b202", "lc")
+
+    lc_meta = local_client._stored_catalog("b202", "lc")
+    lc_path = local_client.catalogs_path / lc_meta["filename"]
+    with open(lc_path, "r+b") as fp:
+        fp.seek(100)
+        fp.write(b"corrupted")
+    features_meta = local_client._stored_catalog("b202", "features")
+    features_path = local_client.catalogs_path / features_meta["filename"]
+    features_path.unlink()
+
+    status = {
+        (r["tile"], r["catalog"]): r["status"]
+        for r in local_client.cache_verify()
+    }
+    assert status == {
+        ("b201", "features"): "ok",
+        ("b202", "features"): "missing",
+        ("b202", "lc"): "corrupted",
+    }
+
+    local_client.cache_verify(remove=True)
+    assert [r["status"] for r in local_client.cache_verify()] == ["ok"]
+    assert not lc_path.exists()
+
+
+def test_match_catalogs(local_client):
+    assert local_client.match_catalogs(["b2*:features"]) == [
+        ("b201", "features"),
+        ("b202", "features"),
+    ]
+    assert local_client.match_catalogs(["b202", "b20[12]:lc"]) == [
+        ("b202", "features"),
+        ("b202", "lc"),
+        ("b201", "lc"),
+    ]
+    with pytest.raises(ValueError):
+        local_client.match_catalogs(["b201:features", "b3*"])
+
+
+def test_prefetch(local_client, local_server):
+    local_client.get_catalog("b201", "features")
+    expected_size = sum(
+        local_client.catalog_info(*tc)["size"]
+        for tc in [("b202", "features"), ("b202", "lc")]
+    )
+
+    plan = local_client.prefetch(["*:features", "b202:*"], dry_run=True)
+    assert plan == {
+        "pending": [("b202", "features"), ("b202", "lc")],
+        "stored": [("b201", "features")],
+        "size": expected_size,
+    }
+    assert local_client._stored_catalog("b202", "features") is None
+
+    assert local_client.prefetch(["*:features", "b202:*"]) == plan
+    assert local_client._stored_catalog("b202", "features") is not None
+    assert local_client._stored_catalog("b202", "lc") is not None
+
+    plan = local_client.prefetch(["*:features", "b202:*"])
+    assert plan["pending"] == [] and plan["size"] == 0
+
+
+def test_get_dataset(local_client, local_server):
+    catalogs = local_server["catalogs"]
+    expected = pd.concat(
+        [
+            catalogs[(tile, "features")].assign(tile=tile)
+            for tile in ("b201", "b202")
+        ],
+        ignore_index=True,
+    )
+
+    df = local_client.get_dataset()
+    assert df.tile.dtype == "category"
+    pd.testing.assert_frame_equal(
+        df.astype({"tile": str}), expected, check_like=True
+    )
+
+
+def test_get_dataset_columns_and_filters(local_client, local_server):
+    features = local_server["catalogs"][("b202", "features")]
+
+    df = local_client.get_dataset(
+        "features",
+        columns=["id", "ra_k", "tile"],
+        filters=[("tile", "=", "b202"), ("ra_k", ">", 272.5)],
+    )
+    expected = features[features.ra_k > 272.5][["id", "ra_k"]]
+    assert list(df.columns) == ["id", "ra_k", "tile"]
+    assert set(df.tile) == {"b202"}
+    np.testing.assert_array_equal(df.id, expected.id)
+
+    df = local_client.get_dataset("lc", tiles=["b201"], columns=["bm_src_id"])
+    assert len(df) == len(local_server["catalogs"][("b201", "lc")])
+    assert local_client._stored_catalog("b202", "lc") is None
+
+    with pytest.raises(ValueError):
+        local_client.get_dataset(columns=["id", "nope"])
+
+
+def angular_separation(ra0, dec0, ra, dec):
+    ra0, dec0, ra, dec = map(np.radians, (ra0, dec0, ra, dec))
+    hav_dec = np.sin((dec - dec0) / 2) ** 2
+    hav_ra = np.cos(dec0) * np.cos(dec) * np.sin((ra - ra0) / 2) ** 2
+    hav = hav_dec + hav_ra
+    return np.degrees(2 * np.arcsin(np.sqrt(hav))) * 3600
+
+
+def test_cone_search(local_client, local_server):
+    catalogs = local_server["catalogs"]
+    src = catalogs[("b202", "features")].iloc[10]
+
+    df = local_client.cone_search(src.ra_k, src.dec_k, 1800)
+
+    expected = set()
+    for tile in ("b201", "b202"):
+        features = catalogs[(tile, "features")]
+        sep = angular_separation(
+            src.ra_k, src.dec_k, features.ra_k, features.dec_k
+        )
+        expected.update((tile, i) for i in features.id[sep <= 1800])
+
+    assert set(zip(df.tile, df.id)) == expected
+    assert {"b201", "b202"} == set(df.tile)
+    assert df.separation.is_monotonic_increasing
+    assert df.id[0] == src.id
+    np.testing.assert_allclose(
+        df.separation,
+        angular_separation(src.ra_k, src.dec_k, df.ra_k, df.dec_k),
+        atol=1e-6,
+    )
+
+
+def test_cone_search_skip_tiles(local_client, local_server, mocker):
+    src = local_server["catalogs"][("b202", "features")].iloc[0]
+    local_client.cone_search(src.ra_k, src.dec_k, 1)
+
+    def hits():
+        stored = local_client.cache_list()
+        return {row["tile"]: row["hits"] for row in stored}
+
+    before = hits()
+
+    # the index is stored, and the b201 footprint is far away
+    build = mocker.spy(carpyncho.Carpyncho, "_build_sky_index")
+    load = mocker.spy(carpyncho.pickle, "load")
+    read_schema = mocker.spy(carpyncho.pq, "read_schema")
+    client = carpyncho.Carpyncho(
+        cache_path=local_client.cache_path, index_url=local_client.index_url
+    )
+    df = client.cone_search(src.ra_k, src.dec_k, 1, columns=["id"])
+
+    assert list(df.columns) == ["id", "tile", "separation"]
+    assert list(df.id) == [src.id]
+    assert build.call_count == 0
+    loaded = [
+        c.args[0].name
+        for c in load.call_args_list
+        if getattr(c.args[0], "name", "").endswith(".sky.pkl")
+    ]
+    assert len(loaded) == 1 and "b202" in loaded[0]
+
+    # the skipped tile is not accessed
+    assert hits() == {"b201": before["b201"], "b202": before["b202"] + 1}
+    schemas = [str(c.args[0]) for c in read_schema.call_args_list]
+    assert not any("b201" in path for path in schemas)
+
+
+def test_cone_search_empty(local_client):
+    df = local_client.cone_search(10, 10, 60, tiles=["b201"], columns=["id"])
+    assert df.empty
+    assert list(df.columns) == ["id", "tile", "separation"]
+
+    with pytest.raises(ValueError):
+        local_client.cone_search(10, 10, 60, tiles=[])
+
+
+def test_crossmatch(local_client, local_server):
+    features = pd.concat(
+        [
+            local_server["catalogs"][(tile, "features")].assign(tile=tile)
+            for tile in ("b201", "b202")
+        ],
+        ignore_index=True,
+    )
+    sample = features.sample(50, random_state=42)
+    df = pd.DataFrame(
+        {
+            "RA": np.append(sample.ra_k + 1e-4, [10.0, np.nan]),
+            "DEC": np.append(sample.dec_k, [10.0, -30.0]),
+        },
+        index=[f"src_{i}" for i in range(52)],
+    )
+
+    result = local_client.crossmatch(
+        df, "RA", "DEC", radius=1, columns=["id", "vs_type"], max_workers=2
+    )
+
+    assert list(result.columns) == ["id", "vs_type", "tile", "separation"]
+    assert list(result.index) == list(df.index)
+    assert result.iloc[-2:].isna().all(axis=None)
+
+    for (_, row), (_, match) in zip(
+        df.iloc[:50].iterrows(), result.iterrows()
+    ):
+        sep = angular_separation(
+            row.RA, row.DEC, features.ra_k.values, features.dec_k.values
+        )
+        nearest = features.iloc[np.argmin(sep)]
+        assert match.id == nearest.id
+        assert match.tile == nearest.tile
+        assert match.separation == pytest.approx(sep.min(), abs=1e-6)
+
+
+def test_get_catalog_bad_checksum(local_client, local_server, mocker):
+    info = dict(local_client.catalog_info("b201", "features"))
+    info["md5sum"] = "0" * 32
+    mocker.patch.object(carpyncho.Carpyncho, "catalog_info", return_value=info)
+
+    with pytest.raises(IOError):
+        local_client.get_catalog("b201", "features")
+
+    leftovers = list(local_client.catalogs_path.glob("**/*.parquet"))
+    assert leftovers == []
+
+
+# =============================================================================
+# ASYNC CLIENT TEST
+# =============================================================================
+
+
+def test_async_client(local_client, local_server):
+    async def run():
+        async with carpyncho.AsyncCarpyncho(local_client) as aclient:
+            tiles = await aclient.list_tiles()
+            info = await aclient.catalog_info("b201", "lc")
+            has = await aclient.has_catalog("b201", "foo")
+            dfs = await aclient.get_catalogs(
+                [(tile, "features") for tile in tiles],
+                columns=["id", "ra_k"],
+            )
+        return tiles, info, has, dfs
+
+    tiles, info, has, dfs = asyncio.run(run())
+
+    assert tiles == local_client.list_tiles()
+    assert info == local_client.catalog_info("b201", "lc")
+    assert not has
+    for (tile, catalog), df in dfs.items():
+        expected = local_server["catalogs"][(tile, catalog)]
+        pd.testing.assert_frame_equal(df, expected[["id", "ra_k"]])
+
+
+def test_async_client_gather_same_catalog(local_client, local_server, mocker):
+    expected = local_server["catalogs"][("b202", "lc")]
+    download = mocker.spy(carpyncho.Carpyncho, "_http_download")
+
+    async def run():
+        async with carpyncho.AsyncCarpyncho(local_client) as aclient:
+            return await asyncio.gather(
+                aclient.get_catalog("b202", "lc"),
+                aclient.get_catalog("b202", "lc", columns=["bm_src_id"]),
+            )
+
+    full, ids = asyncio.run(run())
+
+    assert download.call_count == 1
+    pd.testing.assert_frame_equal(full, expected)
+    pd.testing.assert_frame_equal(ids, expected[["bm_src_id"]])
+
+
+def test_async_client_errors(local_client):
+    async def run():
+        async with carpyncho.AsyncCarpyncho(local_client) as aclient:
+            await aclient.get_catalog("b201", "foo")
+
+    with pytest.raises(ValueError):
+        asyncio.run(run())
+
+
+# =============================================================================
+# BZIP2 TEST
+# =============================================================================
+
+
+@pytest.fixture
+def multistream_bz2(tmp_path):
+    random = np.random.default_rng(42)
+    streams = [random.bytes(10_000) * 3 for _ in range(20)]
+    path = tmp_path / "multi.bz2"
+    path.write_bytes(b"".join(bz2.compress(s, 1) for s in streams))
+    return path, b"".join(streams)
+
+
+def test_bz2_segments(multistream_bz2):
+    path, _ = multistream_bz2
+    data = path.read_bytes()
+
+    segments = carpyncho.bz2_segments(data, segment_size=1)
+    assert len(segments) == 20
+    assert segments[0][0] == 0 and segments[-1][1] == len(data)
+
+    segments = carpyncho.bz2_segments(data, segment_size=len(data) // 3)
+    assert len(segments) == 3
+
+    single = bz2.compress(b"a" * 1000)
+    assert carpyncho.bz2_segments(single, segment_size=1) == [(0, len(single))]
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_bz2_decompress_file(multistream_bz2, tmp_path, workers):
+    path, expected = multistream_bz2
+    with open(tmp_path / "out", "w+b") as dst:
+        parallel = carpyncho.bz2_decompress_file(
+            path, dst, workers=workers, segment_size=1
+        )
+    assert parallel == (workers > 1)
+    assert (tmp_path / "out").read_bytes() == expected
+
+
+def test_bz2_decompress_file_false_positive(multistream_bz2, tmp_path, mocker):
+    path, expected = multistream_bz2
+    size = path.stat().st_size
+
+    # a fake start of stream in the middle of the first stream
+    mocker.patch("carpyncho.bz2_segments", return_value=[(0, 10), (10, size)])
+
+    with open(tmp_path / "out", "w+b") as dst:
+        parallel = carpyncho.bz2_decompress_file(path, dst, workers=4)
+    assert not parallel
+    assert (tmp_path / "out").read_bytes() == expected
+
+
 # =============================================================================
 # CLI TEST
 # =============================================================================
@@ -209,6 +1616,291 @@ def test_CLI_download_catalog(client, script_runner):
     assert "_test-parquet_bz2_small: " in ret.stderr
 
 
+def test_CLI_download_catalog_columns(local_client, script_runner):
+    outpath = os.path.join(TEST_CACHE_PATH, "test_columns.csv")
+
+    ret = script_runner.run(
+        "carpyncho",
+        "--cache-path",
+        local_client.cache_path,
+        "--index-url",
+        local_client.index_url,
+        "download-catalog",
+        "b201",
+        "features",
+        "--out",
+        outpath,
+        "--columns",
+        "id",
+        "--columns",
+        "ra_k",
+    )
+    assert ret.stdout.strip() == f"Writing {outpath}..."
+    assert list(pd.read_csv(outpath, index_col=0).columns) == ["id", "ra_k"]
+
+
+def read_zstd_csv(path):
+    with pa.CompressedInputStream(pa.OSFile(str(path)), "zstd") as src:
+        df = pa_csv.read_csv(src).to_pandas()
+    return df.set_index(df.columns[0]).rename_axis(None)
+
+
+@pytest.mark.parametrize(
+    "ext, compression, read",
+    [
+        (".csv", None, functools.partial(pd.read_csv, index_col=0)),
+        (".csv.gz", "gzip", functools.partial(pd.read_csv, index_col=0)),
+        (".csv.zst", None, read_zstd_csv),
+        (".parquet", None, pd.read_parquet),
+        (".parquet", "zstd", pd.read_parquet),
+        (".pkl", None, pd.read_pickle),
+    ],
+)
+def test_CLI_download_catalog_stream(
+    local_client,
+    local_server,
+    script_runner,
+    mocker,
+    tmp_path,
+    ext,
+    compression,
+    read,
+):
+    expected = local_server["catalogs"][("b201", "lc")]
+    get_catalog = mocker.spy(carpyncho.Carpyncho, "get_catalog")
+
+    outpath = tmp_path / f"lc{ext}"
+    args = ["--compression", compression] if compression else []
+    ret = script_runner.run(
+        "carpyncho",
+        "--cache-path",
+        local_client.cache_path,
+        "--index-url",
+        local_client.index_url,
+        "download-catalog",
+        "b201",
+        "lc",
+        "--out",
+        str(outpath),
+        *args,
+    )
+    assert ret.success
+    get_catalog.assert_not_called()
+
+    df = read(outpath)
+    pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+    if ext == ".parquet" and compression:
+        metadata = pq.ParquetFile(outpath).metadata
+        assert metadata.row_group(0).column(0).compression == "ZSTD"
+
+
+@pytest.mark.parametrize("ext", [".csv", ".csv.gz"])
+def test_CLI_download_catalog_csv_format(
+    local_client, local_server, script_runner, mocker, tmp_path, ext
+):
+    expected = local_server["catalogs"][("b201", "features")]
+    local_client.get_catalog("b201", "features")
+
+    # many batches of a few rows
+    iter_catalog = carpyncho.Carpyncho.iter_catalog
+    mocker.patch.object(
+        carpyncho.Carpyncho,
+        "iter_catalog",
+        lambda self, *args, **kwargs: iter_catalog(
+            self, *args, batch_size=7, **kwargs
+        ),
+    )
+
+    outpath = tmp_path / f"features{ext}"
+    ret = script_runner.run(
+        "carpyncho",
+        "--cache-path",
+        local_client.cache_path,
+        "--index-url",
+        local_client.index_url,
+        "download-catalog",
+        "b201",
+        "features",
+        "--out",
+        str(outpath),
+    )
+    assert ret.success
+
+    with pa.input_stream(str(outpath), compression="detect") as src:
+        assert src.read().decode() == expected.to_csv()
+
+
+def test_CLI_download_catalog_refused(
+    local_client, script_runner, mocker, tmp_path
+):
+    mocker.patch("carpyncho.EXCEL_MAX_ROWS", 10)
+    download = mocker.spy(carpyncho.Carpyncho, "_http_download")
+
+    def run(out, *args):
+        return script_runner.run(
+            "carpyncho",
+            "--cache-path",
+            local_client.cache_path,
+            "--index-url",
+            local_client.index_url,
+            "download-catalog",
+            "b201",
+            "lc",
+            "--out",
+            str(tmp_path / out),
+            *args,
+        )
+
+    ret = run("lc.xlsx")
+    assert not ret.success
+    assert "an Excel sheet supports only 10" in ret.stderr
+
+    ret = run("lc.csv", "--compression", "bz2")
+    assert not ret.success
+
+    ret = run("lc.pkl", "--compression", "gzip")
+    assert not ret.success
+
+    download.assert_not_called()
+
+
+def test_CLI_download_many(local_client, script_runner):
+    local_client.get_catalog("b201", "lc")
+
+    ret = script_runner.run(
+        "carpyncho",
+        "--cache-path",
+        local_client.cache_path,
+        "--index-url",
+        local_client.index_url,
+        "download-many",
+        "b201:lc",
+        "b202:lc",
+        "--max-workers",
+        "2",
+    )
+    assert ret.stdout.strip() == "1 catalogs downloaded, 1 already stored"
+    assert local_client._stored_catalog("b202", "lc") is not None
+
+    ret = script_runner.run(
+        "carpyncho",
+        "--cache-path",
+        local_client.cache_path,
+        "--index-url",
+        local_client.index_url,
+        "download-all",
+    )
+    assert ret.stdout.strip() == "2 catalogs downloaded, 2 already stored"
+
+    ret = script_runner.run(
+        "carpyncho",
+        "--cache-path",
+        local_client.cache_path,
+        "--index-url",
+        local_client.index_url,
+        "download-many",
+        "b201",
+    )
+    assert not ret.success
+    assert "Invalid catalog 'b201'" in ret.stderr
+
+
+def test_CLI_cache(local_client, script_runner):
+    local_client.get_catalog("b201", "features")
+    local_client.get_catalog("b201", "lc")
+    local_client.get_catalog("b202", "lc")
+
+    def run(*args):
+        return script_runner.run(
+            "carpyncho",
+            "--cache-path",
+            local_client.cache_path,
+            "--index-url",
+            local_client.index_url,
+            *args,
+        )
+
+    ret = run("cache-ls")
+    assert ret.success
+    assert "b201-features" in ret.stdout
+    assert ret.stdout.strip().splitlines()[-1].startswith("3 catalogs")
+
+    ret = run("cache-verify")
+    assert ret.success
+    assert ret.stdout.count(": ok") == 3
+
+    ret = run("cache-rm", "b201", "lc")
+    assert ret.stdout.strip() == "Removed b201-lc"
+
+    ret = run("cache-prune")
+    assert not ret.success
+
+    ret = run("cache-prune", "--max-size", "0")
+    assert ret.stdout.strip().splitlines()[-1] == "2 catalogs removed"
+    assert local_client.cache_list() == []
+
+
+def test_CLI_prefetch(local_client, script_runner):
+    def run(*args):
+        return script_runner.run(
+            "carpyncho",
+            "--cache-path",
+            local_client.cache_path,
+            "--index-url",
+            local_client.index_url,
+            "prefetch",
+            *args,
+        )
+
+    ret = run("b20*:lc", "--dry-run")
+    assert ret.success
+    assert (
+        ret.stdout.strip()
+        .splitlines()[-1]
+        .startswith("2 catalogs to download")
+    )
+    assert local_client._stored_catalog("b201", "lc") is None
+
+    ret = run("b201:lc")
+    assert ret.success
+    assert local_client._stored_catalog("b201", "lc") is not None
+
+    ret = run("b3*")
+    assert not ret.success
+    assert "Pattern 'b3*' doesn't match any catalog" in ret.stderr
+
+
+def test_CLI_query(local_client, local_server, script_runner, tmp_path):
+    pytest.importorskip("duckdb")
+
+    def run(*args):
+        return script_runner.run(
+            "carpyncho",
+            "--cache-path",
+            local_client.cache_path,
+            "--index-url",
+            local_client.index_url,
+            "query",
+            *args,
+        )
+
+    features = local_server["catalogs"][("b201", "features")]
+    local_client.get_catalog("b201", "features")
+    query = "SELECT count(*) AS total FROM b201.features"
+
+    ret = run(query)
+    assert ret.success
+    assert ret.stdout.split() == ["total", str(len(features))]
+
+    out = tmp_path / "out.parquet"
+    ret = run(query, "--out", str(out))
+    assert ret.success
+    assert pd.read_parquet(out).total.tolist() == [len(features)]
+
+    ret = run(query, "--out", str(tmp_path / "out.foo"))
+    assert not ret.success
+
+
 # =============================================================================
 # INDEX JSON TEST
 # =============================================================================